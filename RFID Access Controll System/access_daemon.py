@@ -0,0 +1,190 @@
+from launch import LAUNCH_TIME  # First, so first_serviceable_scan is comparable with the GUI's
+import argparse, json, os, queue, signal, socket, struct, threading, time
+
+from access_engine import AccessEngine
+from user_store import UserStore, UserTable
+
+# — Configuration —
+PORT = os.environ.get("RFID_PORT", 'COM5')
+BAUD = 9600
+READERS = [{"door": "Main", "port": PORT, "baud": BAUD}]
+READ_MODE = "blocking"
+USERS_FILE = "users.json"
+USERS_DB_FILE = "users.db"
+LOGS_FILE = "access_logs.csv"
+LOGS_DB_FILE = "access_logs.db"
+METRICS_FILE = "rfid_metrics.prom"
+METRICS_INTERVAL = 15.0  # in seconds
+DAEMON_SOCKET = os.environ.get("RFID_DAEMON_SOCKET", "rfid_events.sock")
+CLIENT_SEND_TIMEOUT = 0.5  # in seconds, a client that can't take an event this fast is dropped
+
+# Custom class for the event stream
+class EventServer:
+    """Unix socket that streams engine events to attached clients as JSON lines
+
+    A client is dropped as soon as a send to it fails or times out.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.clients = []
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            os.remove(path)  # Left over from a daemon that didn't shut down cleanly
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def broadcast(self, event):
+        data = (json.dumps(event) + "\n").encode()
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            try:
+                client.sendall(data)
+            except OSError:
+                self._drop(client)
+
+    def close(self):
+        with self.lock:
+            clients, self.clients = self.clients, []
+        for client in clients:
+            client.close()
+        self.sock.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                return  # Server closed
+            # Sends time out, so a stalled client can't hold up the others
+            seconds = int(CLIENT_SEND_TIMEOUT)
+            client.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO,
+                              struct.pack("ll", seconds, int((CLIENT_SEND_TIMEOUT - seconds) * 1e6)))
+            with self.lock:
+                self.clients.append(client)
+
+    def _drop(self, client):
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+        client.close()
+
+# Custom class for the GUI side of the event stream
+class DaemonClient:
+    """Attaches to a running daemon; stands in for AccessEngine in the GUI
+
+    The daemon answers the doors and writes the log, and it watches the user
+    store itself, so publish_users() has nothing to do here.
+    """
+    def __init__(self, path=DAEMON_SOCKET):
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix sockets are not available on this platform")  # e.g. Windows
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.events = queue.Queue()
+        self.thread = threading.Thread(target=self._read_events, daemon=True)
+        self.thread.start()
+
+    def publish_users(self, users):
+        pass
+
+    def poll_events(self, timeout=0):
+        pending = []
+        try:
+            pending.append(self.events.get(timeout=timeout) if timeout else self.events.get_nowait())
+            while True:
+                pending.append(self.events.get_nowait())
+        except queue.Empty:
+            return pending
+
+    def stop(self):
+        self.sock.close()
+
+    def _read_events(self):
+        try:
+            for line in self.sock.makefile("r"):
+                self.events.put(tuple(json.loads(line)))
+        except (OSError, ValueError):
+            pass
+        self.events.put(("error", "daemon", "event stream closed"))
+
+def run_daemon(readers=READERS, read_mode=READ_MODE, socket_path=DAEMON_SOCKET):
+    """Serve the doors without a GUI until SIGINT or SIGTERM"""
+    # Users and the engine first, so the doors answer before the log store is even opened
+    user_table = UserTable(UserStore(USERS_DB_FILE, json_path=USERS_FILE))
+    engine = AccessEngine(readers, read_mode)
+    user_table.on_change(lambda snapshot: engine.publish_users(snapshot))
+    engine.publish_users(user_table.reload())
+    engine.start()
+    user_table.start_watcher()
+    print(f"Engine started {(time.perf_counter() - LAUNCH_TIME) * 1000:.0f} ms after launch")
+
+    # Logging and metrics, imported here to keep them off the path to the first scan
+    from access_log import EventStore, LogArchive, LogWriter, ScanLog
+    from metrics import Metrics
+    metrics = Metrics()
+    event_store = EventStore(LOGS_DB_FILE)
+    imported = event_store.migrate_csv(LOGS_FILE)
+    if imported:
+        print(f"Imported {imported} log entries from {LOGS_FILE} into {LOGS_DB_FILE}")
+    log_writer = LogWriter(LOGS_FILE, store=event_store, archive=LogArchive(LOGS_FILE),
+                           on_batch=lambda rows, seconds: metrics.observe("log_write", seconds))
+    scan_log = ScanLog(log_writer)
+
+    server = EventServer(socket_path)
+    print(f"Streaming events on {socket_path}")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+
+    def handle(event):
+        kind = event[0]
+        if kind == "card":
+            _, door, uid, is_authorized, received, timings = event
+            metrics.observe_many(timings)
+            metrics.count_scan(door, is_authorized)
+            user = user_table.snapshot.get(uid)
+            scan_log.opened(door, uid, user["name"] if user else "Unknown User", is_authorized)
+        elif kind == "card_done":
+            scan_log.closed(*event[1:])
+        elif kind == "suppressed":
+            metrics.count_suppressed(event[1], event[2])
+            scan_log.suppressed(*event[1:])
+        elif kind == "connected":
+            metrics.mark_startup("first_serviceable_scan", time.perf_counter() - LAUNCH_TIME)
+        elif kind in ("connect_error", "error"):
+            print(f"{kind} at {event[1]}: {event[-1]}")
+
+    next_metrics = time.monotonic() + METRICS_INTERVAL
+    while not stop.is_set():
+        for event in engine.poll_events(timeout=1.0):
+            handle(event)
+            server.broadcast(event)
+        if time.monotonic() >= next_metrics:
+            next_metrics += METRICS_INTERVAL
+            try:
+                metrics.write_prometheus(METRICS_FILE)
+            except Exception as e:
+                print(f"Error writing metrics: {e}")
+
+    engine.stop()  # Closes the open cooldown windows
+    for event in engine.poll_events():
+        handle(event)
+    scan_log.close_all()
+    log_writer.close()
+    server.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless RFID access control: serial readers, decisions and logging")
+    parser.add_argument("--port", default=PORT, help="serial port of the Main door reader (default: %(default)s)")
+    parser.add_argument("--read-mode", default=READ_MODE, choices=("blocking", "select", "poll"))
+    parser.add_argument("--socket", default=DAEMON_SOCKET, help="event stream socket (default: %(default)s)")
+    args = parser.parse_args()
+
+    readers = READERS if args.port == PORT else [{"door": "Main", "port": args.port, "baud": BAUD}]
+    run_daemon(readers, args.read_mode, args.socket)
@@ -0,0 +1,350 @@
+import multiprocessing, queue, select, struct, threading, time
+from collections import OrderedDict
+from multiprocessing import shared_memory
+
+import serial
+
+# — Configuration —
+READ_TIMEOUT = 1.0  # in seconds
+CARD_TABLE_SIZE = 4 * 1024 * 1024  # bytes reserved for the shared card table
+CARD_COOLDOWN = 3.0  # in seconds, a card read again within this long of its last read is a repeat
+UNKNOWN_RATE = 1.0  # unknown cards per second reported once a burst is used up (None to disable)
+UNKNOWN_BURST = 5  # unknown cards reported back to back before the rate limit applies
+TABLE_REFRESH_INTERVAL = 0.05  # in seconds, how often the engine picks up a newly published card table
+UNKNOWN_REPORT_CARDS = 100  # distinct rate-limited cards held before they are reported, even mid-burst
+
+# Custom class for the shared authorized-card table
+class SharedCardTable:
+    """Snapshot of authorized card IDs kept in shared memory
+
+    The GUI process publishes, the engine process reads. A sequence number
+    works as a seqlock: it is odd while a write is in progress, so readers
+    retry instead of seeing half a table. snapshot() parses a new table into
+    cards; lookups read cards directly, so they never pay for the parse.
+    """
+    HEADER = struct.Struct("<QI")  # sequence number, payload length
+
+    def __init__(self, name=None, size=CARD_TABLE_SIZE):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.HEADER.pack_into(self.shm.buf, 0, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.write_lock = threading.Lock()  # The seqlock allows one writer at a time
+        self._seq = None
+        self.cards = frozenset()  # Last snapshot() result
+
+    def publish(self, uids):
+        """Replace the table with a new set of card IDs"""
+        payload = "\n".join(sorted(uids)).encode()
+        if self.HEADER.size + len(payload) > self.shm.size:
+            raise ValueError(f"Card table too large for shared memory ({len(payload)} bytes)")
+
+        with self.write_lock:
+            seq = self.HEADER.unpack_from(self.shm.buf, 0)[0]
+            self.HEADER.pack_into(self.shm.buf, 0, seq + 1, 0)  # Mark write in progress
+            self.shm.buf[self.HEADER.size:self.HEADER.size + len(payload)] = payload
+            self.HEADER.pack_into(self.shm.buf, 0, seq + 2, len(payload))
+
+    def snapshot(self):
+        """Return the current card IDs as a frozenset (parsed only when the table changed)"""
+        while True:
+            seq, length = self.HEADER.unpack_from(self.shm.buf, 0)
+            if seq == self._seq:
+                return self.cards
+            if seq % 2:
+                time.sleep(0)  # Writer busy, let it finish
+                continue
+            payload = bytes(self.shm.buf[self.HEADER.size:self.HEADER.size + length])
+            if self.HEADER.unpack_from(self.shm.buf, 0)[0] != seq:
+                continue  # Table changed while copying, read again
+            self.cards = frozenset(payload.decode().split("\n")) if payload else frozenset()
+            self._seq = seq
+            return self.cards
+
+    def close(self, unlink=False):
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+# Custom class for per-card cooldowns
+class ScanWindow:
+    """Cards seen recently at one door, each with a cooldown that every repeat extends
+
+    Entries are kept in last-seen order, so expiring them only looks at the
+    front. Reader threads and the engine's shutdown both use it, hence the lock.
+    """
+    def __init__(self, cooldown=CARD_COOLDOWN):
+        self.cooldown = cooldown
+        self.cards = OrderedDict()  # uid -> [last seen, repeats]
+        self.lock = threading.Lock()
+
+    def repeat(self, uid, now):
+        """True if uid is still inside its window, counting it as a repeat"""
+        with self.lock:
+            entry = self.cards.get(uid)
+            if entry is None or now - entry[0] >= self.cooldown:
+                return False
+            entry[0] = now
+            entry[1] += 1
+            self.cards.move_to_end(uid)
+            return True
+
+    def open(self, uid, now):
+        with self.lock:
+            self.cards[uid] = [now, 0]
+            self.cards.move_to_end(uid)
+
+    def expire(self, now):
+        """Remove and return [(uid, repeats)] for cards whose window has closed"""
+        closed = []
+        with self.lock:
+            while self.cards:
+                uid, (last_seen, repeats) = next(iter(self.cards.items()))
+                if now - last_seen < self.cooldown:
+                    break
+                self.cards.popitem(last=False)
+                closed.append((uid, repeats))
+        return closed
+
+    def close_all(self):
+        with self.lock:
+            closed = [(uid, repeats) for uid, (_, repeats) in self.cards.items()]
+            self.cards.clear()
+        return closed
+
+# Custom class for the unknown-card rate limit
+class RateLimiter:
+    """Token bucket: burst tokens, refilled at rate per second"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def allow(self, now):
+        if self.rate is None:
+            return True
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+# — Serial helpers —
+def make_serial_poller(ser, read_mode):
+    """Prepare fd waiting for the given read mode, or None for plain blocking reads"""
+    if read_mode not in ("select", "poll"):
+        return None
+    try:
+        fd = ser.fileno()
+    except Exception as e:
+        # Windows COM ports have no selectable fd
+        print(f"Read mode '{read_mode}' not available ({e}), using blocking reads")
+        return None
+    if read_mode == "poll" and hasattr(select, "poll"):
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        return poller
+    return select
+
+def wait_for_serial_bytes(ser, poller=None):
+    """Block until bytes arrive on the serial port and return everything available"""
+    if poller is select:
+        ready, _, _ = select.select([ser.fileno()], [], [], READ_TIMEOUT)
+        if not ready:
+            return b""
+        return ser.read(ser.in_waiting or 1)
+    if poller is not None:
+        # Sleep in the kernel until the port's fd becomes readable
+        if not poller.poll(READ_TIMEOUT * 1000):
+            return b""
+        return ser.read(ser.in_waiting or 1)
+
+    # Blocking read returns as soon as the first byte arrives (or the timeout expires)
+    data = ser.read(1)
+    if data and ser.in_waiting:
+        data += ser.read(ser.in_waiting)
+    return data
+
+# — Engine process —
+def close_windows(door, closed, events):
+    """Tell the GUI a card's window has closed, with the repeats it folded"""
+    for uid, repeats in closed:
+        events.put(("card_done", door, uid, repeats))
+
+def report_suppressed(door, suppressed, events):
+    """Send the rate-limited unknown cards as (total reads, [(uid, first read, reads)]) and forget them"""
+    cards = [(uid, first, reads) for uid, (first, reads) in suppressed.items()]
+    events.put(("suppressed", door, sum(reads for _, _, reads in cards), cards))
+    suppressed.clear()
+
+def reader_loop(reader, read_mode, table, events, window, limits, stop):
+    """Serial reader and access decision loop for one door, runs in a thread of the engine process
+
+    Every line gets its '1'/'0' reply, since the sketch waits for one. Repeats
+    of a card inside its cooldown and unknown cards over the rate limit send
+    no card event, so they cost no render. Unknown cards over the limit are
+    reported once the burst is over (or UNKNOWN_REPORT_CARDS distinct cards
+    have built up), each with its first time and number of reads.
+    """
+    door = reader["door"]
+    try:
+        ser = serial.Serial(reader["port"], reader["baud"], timeout=READ_TIMEOUT)
+    except Exception as e:
+        events.put(("connect_error", door, reader["port"], str(e)))
+        return
+    events.put(("connected", door, reader["port"]))
+
+    poller = make_serial_poller(ser, read_mode)
+    buffer = b""
+    limiter = RateLimiter(*limits)
+    suppressed = {}  # uid -> [first read (time.time()), reads] of unknown cards over the rate limit
+
+    while not stop.is_set():
+        try:
+            chunk = wait_for_serial_bytes(ser, poller)
+            close_windows(door, window.expire(time.monotonic()), events)
+            if suppressed and not chunk:
+                report_suppressed(door, suppressed, events)  # The burst is over
+            if not chunk:
+                continue
+            if not buffer:
+                line_started = time.perf_counter()  # First bytes of a new line
+            buffer += chunk
+
+            # Handle every complete line as soon as its newline arrives
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                received = time.perf_counter()  # Comparable across processes on the same machine
+                uid = line.decode(errors="ignore").strip().upper()
+                normalized = time.perf_counter()
+                read_time, line_started = received - line_started, received
+                if not uid:
+                    continue
+
+                # Send response back to Arduino straight away, the sketch is blocked waiting for it
+                is_authorized = uid in table.cards  # Kept current by the engine's refresher thread
+                looked_up = time.perf_counter()
+                ser.write(b'1' if is_authorized else b'0')
+                written = time.perf_counter()
+
+                now = time.monotonic()
+                close_windows(door, window.expire(now), events)
+                if window.repeat(uid, now):
+                    continue  # Folded into the card's open window
+                if not is_authorized and not limiter.allow(now):
+                    suppressed.setdefault(uid, [time.time(), 0])[1] += 1
+                    if len(suppressed) >= UNKNOWN_REPORT_CARDS:
+                        report_suppressed(door, suppressed, events)
+                    continue
+                window.open(uid, now)
+
+                # Stage timings for the metrics, in seconds
+                timings = {
+                    "serial_read": read_time,
+                    "uid_normalize": normalized - received,
+                    "table_lookup": looked_up - normalized,
+                    "serial_write": written - looked_up,
+                }
+                events.put(("card", door, uid, is_authorized, received, timings))
+        except Exception as e:
+            print(f"Serial read error at {door}: {e}")
+            events.put(("error", door, str(e)))
+            buffer = b""
+            time.sleep(0.1)  # Back off so a dead port doesn't spin the CPU
+    if suppressed:
+        report_suppressed(door, suppressed, events)
+    ser.close()
+
+def engine_main(readers, read_mode, table_name, events, commands, cooldown=CARD_COOLDOWN,
+                limits=(UNKNOWN_RATE, UNKNOWN_BURST)):
+    """Runs every door's reader in one process until the GUI sends a stop command"""
+    table = SharedCardTable(name=table_name)
+    windows = {reader["door"]: ScanWindow(cooldown) for reader in readers}  # Per-door card cooldowns
+    stop = threading.Event()
+    table.snapshot()
+
+    # Parse newly published tables here, off the reply path
+    def refresh_table():
+        while not stop.wait(TABLE_REFRESH_INTERVAL):
+            try:
+                table.snapshot()
+            except Exception as e:
+                print(f"Error reading card table: {e}")
+
+    threads = [threading.Thread(target=refresh_table, daemon=True)]
+    threads[0].start()
+    for reader in readers:
+        thread = threading.Thread(target=reader_loop,
+                                  args=(reader, read_mode, table, events, windows[reader["door"]], limits, stop),
+                                  daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    while commands.get() != "stop":
+        pass
+
+    stop.set()
+    for thread in threads:
+        thread.join(READ_TIMEOUT * 2)
+    # Report the windows still open so their scans get logged
+    for door, window in windows.items():
+        close_windows(door, window.close_all(), events)
+    table.close()
+
+class AccessEngine:
+    """GUI-side handle for the access decision process
+
+    readers is a list of {"door": ..., "port": ..., "baud": ...}; every door
+    shares the one card table published by the GUI. A card sends one "card"
+    event when first read and one "card_done" event, with the number of
+    repeats folded into it, once cooldown seconds pass without a read.
+    """
+    def __init__(self, readers, read_mode="blocking", cooldown=CARD_COOLDOWN,
+                 unknown_rate=UNKNOWN_RATE, unknown_burst=UNKNOWN_BURST):
+        self.readers = readers
+        self.read_mode = read_mode
+        self.cooldown = cooldown
+        self.limits = (unknown_rate, unknown_burst)
+        self.table = SharedCardTable()
+        self.events = multiprocessing.Queue()
+        self.commands = multiprocessing.Queue()
+        self.process = None
+
+    def start(self):
+        self.process = multiprocessing.Process(
+            target=engine_main,
+            args=(self.readers, self.read_mode, self.table.name, self.events, self.commands,
+                  self.cooldown, self.limits),
+            daemon=True
+        )
+        self.process.start()
+
+    def publish_users(self, users):
+        """Push the authorized card IDs to the engine"""
+        self.table.publish(users.keys())
+
+    def poll_events(self, timeout=0):
+        """Return all events the engine has sent since the last call, waiting up to timeout for the first"""
+        pending = []
+        if timeout:
+            try:
+                pending.append(self.events.get(timeout=timeout))
+            except queue.Empty:
+                return pending
+        while True:
+            try:
+                pending.append(self.events.get_nowait())
+            except queue.Empty:
+                return pending
+
+    def stop(self):
+        if self.process is not None and self.process.is_alive():
+            self.commands.put("stop")
+            self.process.join(READ_TIMEOUT * 3)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.table.close(unlink=True)
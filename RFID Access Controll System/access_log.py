@@ -0,0 +1,840 @@
+import csv, datetime, gzip, io, json, os, queue, shutil, sqlite3, string, threading, time
+from collections import Counter
+
+# — Configuration —
+LOG_HEADER = ["Timestamp", "Card ID", "Name", "Status", "Door", "Repeats"]
+LOG_QUEUE_SIZE = 10000  # rows waiting in memory before log_access blocks
+LOG_BATCH_SIZE = 100  # write as soon as this many rows are waiting
+LOG_FLUSH_INTERVAL = 1.0  # in seconds, longest time a row waits before it is written
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"  # sorts the same as text, so indexes can range-scan it
+SEARCH_MIN_TRIGRAM = 3  # name searches shorter than this can't use the trigram index
+LOG_ROTATE_BYTES = 5 * 1024 * 1024  # rotate the live CSV once it is this big
+LOG_ROTATE_AGE = 24 * 3600  # in seconds, rotate once the oldest live row is this old
+EXPORT_PROGRESS_EVERY = 1000  # report export progress after this many rows
+
+def event_row(row):
+    """[timestamp, card_id, name, status, door, repeats] from a log row, older rows get an empty door and 0 repeats"""
+    row = list(row[:6])
+    row += ["", 0][len(row) - 4:] if len(row) < 6 else []
+    row[5] = int(row[5] or 0)
+    return row
+
+def upgrade_log_file(path):
+    """Rewrite a CSV log written under an older header (no door or repeats) under LOG_HEADER
+
+    Appending the current rows under the old header would leave a CSV whose
+    rows don't match its header. Returns True if the file was rewritten.
+    """
+    try:
+        with open(path, "r", newline='') as f:
+            header = next(csv.reader(f), None)
+    except FileNotFoundError:
+        return False
+    if not header or header == LOG_HEADER:
+        return False
+    temp_path = f"{path}.tmp"
+    with open(path, "r", newline='') as src, open(temp_path, "w", newline='') as dst:
+        writer = csv.writer(dst)
+        writer.writerow(LOG_HEADER)
+        for row in csv.reader(src):
+            if len(row) >= 4 and row[0] != LOG_HEADER[0]:
+                writer.writerow(event_row(row))
+    os.replace(temp_path, path)
+    print(f"Upgraded {path} to the current log columns")
+    return True
+
+def row_filter(text=None, status=None):
+    """Predicate for log rows: card ID prefix or case-insensitive name match, and exact status"""
+    card_prefix = text.strip().upper() if text else None
+    name_part = text.strip().casefold() if text else None
+    def match(row):
+        if status is not None and row[3] != status:
+            return False
+        if card_prefix and not (row[1].startswith(card_prefix) or name_part in row[2].casefold()):
+            return False
+        return True
+    return match
+
+def export_rows(path, rows, match=None, progress=None, cancel=None):
+    """Stream rows to a CSV file (gzipped if path ends in .gz), returns the rows written
+
+    progress(scanned, written) is called every EXPORT_PROGRESS_EVERY rows. If the
+    cancel event is set the partial file is removed and None is returned.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    scanned = written = 0
+    try:
+        with opener(path, "wt", newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(LOG_HEADER)
+            for row in rows:
+                scanned += 1
+                if match is None or match(row):
+                    writer.writerow(row)
+                    written += 1
+                if scanned % EXPORT_PROGRESS_EVERY == 0:
+                    if cancel is not None and cancel.is_set():
+                        break
+                    if progress is not None:
+                        progress(scanned, written)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    if cancel is not None and cancel.is_set():
+        os.remove(path)
+        return None
+    if progress is not None:
+        progress(scanned, written)
+    return written
+
+class _FlushRequest:
+    """Marker queued by flush(), the writer sets done once everything before it is on disk"""
+    def __init__(self, durable):
+        self.durable = durable
+        self.done = threading.Event()
+
+# Custom class for the indexed access event store
+class EventStore:
+    """Access events in SQLite (WAL mode) with indexes on timestamp and card ID
+
+    Each thread gets its own connection, so the Logs tab can read while the
+    log writer is committing.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+        conn = self.connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY,
+                ts TEXT NOT NULL,
+                card_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                door TEXT NOT NULL DEFAULT '',
+                repeats INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+            CREATE INDEX IF NOT EXISTS idx_events_card_ts ON events (card_id, ts);
+            CREATE INDEX IF NOT EXISTS idx_events_status_ts ON events (status, ts);
+            CREATE INDEX IF NOT EXISTS idx_events_status_id ON events (status, id);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+
+        # Stores created before multi-door support have no door column
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(events)")]
+        if "door" not in columns:
+            with conn:
+                conn.execute("ALTER TABLE events ADD COLUMN door TEXT NOT NULL DEFAULT ''")
+        # ...and stores created before repeat folding have no repeats column
+        if "repeats" not in columns:
+            with conn:
+                conn.execute("ALTER TABLE events ADD COLUMN repeats INTEGER NOT NULL DEFAULT 0")
+
+        # Scans waiting on their cooldown window, so a crash before the window closes doesn't lose them
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS open_scans (
+                door TEXT NOT NULL,
+                card_id TEXT NOT NULL,
+                ts TEXT NOT NULL,
+                name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                PRIMARY KEY (door, card_id, ts)
+            ) WITHOUT ROWID;
+        """)
+
+        # Rollup counters, kept up to date by append() in the same transaction as the events.
+        # rollup_hourly also keeps the lowest and highest event id of each hour, so search()
+        # can turn a time range into an id range.
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS rollup_hourly (
+                hour TEXT NOT NULL,
+                door TEXT NOT NULL,
+                status TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                first_id INTEGER,
+                last_id INTEGER,
+                PRIMARY KEY (hour, door, status)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS rollup_card_daily (
+                day TEXT NOT NULL,
+                card_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (day, card_id, status)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS rollup_denied_cards (
+                card_id TEXT PRIMARY KEY,
+                count INTEGER NOT NULL,
+                last_seen TEXT NOT NULL
+            ) WITHOUT ROWID;
+        """)
+        # Stores created before the id range was kept need the hourly rollup recounted
+        if "first_id" not in [row[1] for row in conn.execute("PRAGMA table_info(rollup_hourly)")]:
+            with conn:
+                conn.execute("ALTER TABLE rollup_hourly ADD COLUMN first_id INTEGER")
+                conn.execute("ALTER TABLE rollup_hourly ADD COLUMN last_id INTEGER")
+                conn.execute("DELETE FROM meta WHERE key = 'rollups_built'")
+        if not conn.execute("SELECT 1 FROM meta WHERE key = 'rollups_built'").fetchone():
+            self.rebuild_rollups()
+
+        # Case-insensitive substring index on names (FTS5 trigram, SQLite 3.34+), filled by a trigger.
+        # Events are only ever deleted all at once, by clear(), so there is no delete trigger.
+        try:
+            conn.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS events_fts
+                    USING fts5(name, content='events', content_rowid='id', tokenize='trigram');
+                CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
+                    INSERT INTO events_fts (rowid, name) VALUES (new.id, new.name);
+                END;
+            """)
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            print(f"Name index not available ({e}), name searches will scan the log")
+            self.fts = False
+        if self.fts and not conn.execute("SELECT 1 FROM meta WHERE key = 'fts_built'").fetchone():
+            with conn:
+                conn.execute("INSERT INTO events_fts (events_fts) VALUES ('rebuild')")
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('fts_built', '1')")
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def append(self, rows, durable=False, opened=()):
+        """Insert rows of [timestamp, card_id, name, status, door, repeats] in one transaction
+
+        opened are [timestamp, card_id, name, status, door] scans to remember
+        as open; a row logged for an open scan closes it.
+        """
+        conn = self.connection()
+        rows = [event_row(row) for row in rows]
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO open_scans (ts, card_id, name, status, door) "
+                             "VALUES (?, ?, ?, ?, ?)", opened)
+            first_id = self._insert_events(conn, rows)
+            conn.executemany("DELETE FROM open_scans WHERE door = ? AND card_id = ? AND ts = ?",
+                             [(row[4], row[1], row[0]) for row in rows])
+            self._add_rollups(conn, rows, first_id)
+        if durable:
+            conn.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def open_scans(self):
+        """[timestamp, card_id, name, status, door] of scans opened but never logged, oldest first"""
+        return [list(row) for row in self.connection().execute(
+            "SELECT ts, card_id, name, status, door FROM open_scans ORDER BY ts")]
+
+    def migrate_csv(self, csv_path):
+        """One-shot import of an existing CSV log, returns the number of rows imported"""
+        conn = self.connection()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'csv_imported'").fetchone():
+            return 0
+        count = 0
+        with conn:
+            if os.path.exists(csv_path):
+                with open(csv_path, "r", newline='') as f:
+                    reader = csv.reader(f)
+                    next(reader, None)  # Skip header
+                    rows = [event_row(row) for row in reader if len(row) >= 4]
+                self._add_rollups(conn, rows, self._insert_events(conn, rows))
+                count = len(rows)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('csv_imported', ?)", (csv_path,))
+        return count
+
+    def query(self, card_id=None, start=None, end=None, limit=None):
+        """Events in time order, optionally for one card and/or a [start, end) time range"""
+        sql = "SELECT id, ts, card_id, name, status, door, repeats FROM events"
+        where, params = [], []
+        if card_id is not None:
+            where.append("card_id = ?")
+            params.append(card_id)
+        if start is not None:
+            where.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("ts < ?")
+            params.append(end)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self.connection().execute(sql, params).fetchall()
+
+    def events_after(self, last_id, limit):
+        """Up to limit events logged after the event with id last_id, oldest first"""
+        return self.connection().execute(
+            "SELECT id, ts, card_id, name, status, door, repeats FROM events WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, limit)
+        ).fetchall()
+
+    def events_before(self, before_id, limit):
+        """Up to limit events logged before the event with id before_id (None for the newest), oldest first"""
+        if before_id is None:
+            rows = self.connection().execute(
+                "SELECT id, ts, card_id, name, status, door, repeats FROM events ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        else:
+            rows = self.connection().execute(
+                "SELECT id, ts, card_id, name, status, door, repeats FROM events WHERE id < ? ORDER BY id DESC LIMIT ?",
+                (before_id, limit)
+            ).fetchall()
+        rows.reverse()
+        return rows
+
+    def first_id_at(self, timestamp):
+        """Id of the first event at or after timestamp, or None"""
+        row = self.connection().execute(
+            "SELECT id FROM events WHERE ts >= ? ORDER BY ts, id LIMIT 1", (timestamp,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def last_id(self):
+        """Id of the newest event, 0 when the store is empty"""
+        return self.connection().execute("SELECT IFNULL(MAX(id), 0) FROM events").fetchone()[0]
+
+    def search(self, text=None, status=None, start=None, end=None, before_id=None, after_id=None, limit=100):
+        """Up to limit matching events, oldest first: the newest ones, or those right before/after an id
+
+        text matches a card ID prefix or, case-insensitively, part of a name;
+        status and the [start, end] time range narrow it down. Card IDs, names
+        and statuses are looked up in their own indexes, each walked in id
+        order until limit rows are found, and the two result lists are merged.
+        The time range is narrowed to the ids logged in its hours first, so
+        the walk starts near it. With the name index, names shorter than
+        SEARCH_MIN_TRIGRAM characters are not searched.
+        """
+        low, high = after_id, before_id
+        if start is not None or end is not None:
+            first_id, last_id = self.id_range(start, end)
+            if first_id is None:
+                return []
+            low = first_id - 1 if low is None else max(low, first_id - 1)
+            high = last_id + 1 if high is None else min(high, last_id + 1)
+
+        where, params = [], []
+        if status is not None:
+            where.append("e.status = ?")
+            params.append(status)
+        if start is not None:
+            where.append("e.ts >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("e.ts <= ?")  # Inclusive, like the export and LogArchive.rows()
+            params.append(end)
+        order = "ASC" if after_id is not None else "DESC"
+        columns = "e.id, e.ts, e.card_id, e.name, e.status, e.door, e.repeats"
+
+        def run(source, extra_where, extra_params, id_column="e.id"):
+            # The id bounds go on the source's own id column so its index can seek to them
+            conditions = extra_where + where
+            bounds = []
+            if low is not None:
+                conditions.append(f"{id_column} > ?")
+                bounds.append(low)
+            if high is not None:
+                conditions.append(f"{id_column} < ?")
+                bounds.append(high)
+            sql = f"SELECT {columns} FROM {source}"
+            if conditions:
+                sql += " WHERE " + " AND ".join(conditions)
+            sql += f" ORDER BY {id_column} {order} LIMIT ?"
+            return self.connection().execute(sql, extra_params + params + bounds + [limit]).fetchall()
+
+        # Without text, a status is walked in id order through (status, id)
+        events = "events e INDEXED BY idx_events_status_id" if status is not None else "events e"
+        text = text.strip() if text else ""
+        if not text:
+            rows = run(events, [], [])
+        else:
+            rows = []
+            # Card IDs are hex, other text can only be part of a name
+            if all(c in string.hexdigits for c in text):
+                prefix = text.upper()
+                rows += run("events e INDEXED BY idx_events_card_ts", ["e.card_id >= ?", "e.card_id < ?"],
+                            [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)])
+            if self.fts and len(text) >= SEARCH_MIN_TRIGRAM:
+                # Ordering by the FTS rowid lets FTS5 walk its doclists in order instead of sorting
+                rows += run("events_fts JOIN events e ON e.id = events_fts.rowid", ["events_fts MATCH ?"],
+                            ['"' + text.replace('"', '""') + '"'], id_column="events_fts.rowid")
+            elif not self.fts:
+                # No name index: scan the names newest first, stopping at limit matches
+                pattern = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                rows += run(events, ["e.name LIKE ? ESCAPE '\\'"], [f"%{pattern}%"])
+            rows = sorted(set(rows), reverse=(order == "DESC"))[:limit]
+
+        if order == "DESC":
+            rows.reverse()
+        return rows
+
+    def id_range(self, start=None, end=None):
+        """(first_id, last_id) bounding every event in the [start, end] time range, (None, None) if none"""
+        sql = "SELECT MIN(first_id), MAX(last_id) FROM rollup_hourly"
+        where, params = [], []
+        # An event's hour is a prefix of its timestamp, so it sorts inside the range's hours
+        if start is not None:
+            where.append("hour >= ?")
+            params.append(start[:13])
+        if end is not None:
+            where.append("hour <= ?")
+            params.append(end[:13])
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return self.connection().execute(sql, params).fetchone()
+
+    def hourly_counts(self, start_hour, end_hour, door=None):
+        """{(hour, status): count} for hours 'YYYY-MM-DD HH' in [start_hour, end_hour], all doors or one"""
+        sql = "SELECT hour, status, SUM(count) FROM rollup_hourly WHERE hour >= ? AND hour <= ?"
+        params = [start_hour, end_hour]
+        if door is not None:
+            sql += " AND door = ?"
+            params.append(door)
+        sql += " GROUP BY hour, status"
+        return {(hour, status): count for hour, status, count in self.connection().execute(sql, params)}
+
+    def top_cards(self, start_day, end_day, status=None, limit=10):
+        """[(card_id, count)] with the most events on days 'YYYY-MM-DD' in [start_day, end_day]"""
+        sql = "SELECT card_id, SUM(count) AS total FROM rollup_card_daily WHERE day >= ? AND day <= ?"
+        params = [start_day, end_day]
+        if status is not None:
+            sql += " AND status = ?"
+            params.append(status)
+        sql += " GROUP BY card_id ORDER BY total DESC, card_id LIMIT ?"
+        params.append(limit)
+        return self.connection().execute(sql, params).fetchall()
+
+    def denied_cards(self, limit=10):
+        """[(card_id, count, last_seen)] for the most often denied cards of all time"""
+        return self.connection().execute(
+            "SELECT card_id, count, last_seen FROM rollup_denied_cards ORDER BY count DESC, card_id LIMIT ?",
+            (limit,)
+        ).fetchall()
+
+    def rebuild_rollups(self):
+        """Recount every rollup from the events table, for stores created before rollups existed"""
+        conn = self.connection()
+        with conn:
+            conn.execute("DELETE FROM rollup_hourly")
+            conn.execute("DELETE FROM rollup_card_daily")
+            conn.execute("DELETE FROM rollup_denied_cards")
+            conn.execute("""
+                INSERT INTO rollup_hourly (hour, door, status, count, first_id, last_id)
+                SELECT substr(ts, 1, 13), door, status, COUNT(*), MIN(id), MAX(id) FROM events GROUP BY 1, 2, 3
+            """)
+            conn.execute("""
+                INSERT INTO rollup_card_daily (day, card_id, status, count)
+                SELECT substr(ts, 1, 10), card_id, status, COUNT(*) FROM events GROUP BY 1, 2, 3
+            """)
+            conn.execute("""
+                INSERT INTO rollup_denied_cards (card_id, count, last_seen)
+                SELECT card_id, COUNT(*), MAX(ts) FROM events WHERE status = 'ACCESS DENIED' GROUP BY card_id
+            """)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rollups_built', '1')")
+
+    def clear(self):
+        conn = self.connection()
+        with conn:
+            conn.execute("DELETE FROM events")
+            if self.fts:
+                conn.execute("INSERT INTO events_fts (events_fts) VALUES ('delete-all')")
+            conn.execute("DELETE FROM rollup_hourly")
+            conn.execute("DELETE FROM rollup_card_daily")
+            conn.execute("DELETE FROM rollup_denied_cards")
+
+    def close(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    def _insert_events(self, conn, rows):
+        """Insert rows into events, returns the id of the first one
+
+        Rows inserted together in one transaction get consecutive ids.
+        """
+        conn.executemany("INSERT INTO events (ts, card_id, name, status, door, repeats) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return conn.execute("SELECT IFNULL(MAX(id), 0) FROM events").fetchone()[0] - len(rows) + 1
+
+    def _add_rollups(self, conn, rows, first_id):
+        """Count rows with ids from first_id on into the rollups, one upsert per distinct key rather than per row"""
+        hourly, daily, denied = {}, Counter(), {}
+        for event_id, (ts, card_id, name, status, door, repeats) in enumerate(rows, first_id):
+            count, low, _ = hourly.get((ts[:13], door, status), (0, event_id, event_id))
+            hourly[(ts[:13], door, status)] = (count + 1, low, event_id)
+            daily[(ts[:10], card_id, status)] += 1
+            if status == "ACCESS DENIED":
+                count, last_seen = denied.get(card_id, (0, ts))
+                denied[card_id] = (count + 1, max(last_seen, ts))
+        conn.executemany("""
+            INSERT INTO rollup_hourly (hour, door, status, count, first_id, last_id) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (hour, door, status) DO UPDATE SET count = count + excluded.count,
+                                                           first_id = min(first_id, excluded.first_id),
+                                                           last_id = max(last_id, excluded.last_id)
+        """, [(*key, *value) for key, value in hourly.items()])
+        conn.executemany("""
+            INSERT INTO rollup_card_daily (day, card_id, status, count) VALUES (?, ?, ?, ?)
+            ON CONFLICT (day, card_id, status) DO UPDATE SET count = count + excluded.count
+        """, [(*key, count) for key, count in daily.items()])
+        conn.executemany("""
+            INSERT INTO rollup_denied_cards (card_id, count, last_seen) VALUES (?, ?, ?)
+            ON CONFLICT (card_id) DO UPDATE SET count = count + excluded.count,
+                                                last_seen = max(last_seen, excluded.last_seen)
+        """, [(card_id, count, last_seen) for card_id, (count, last_seen) in denied.items()])
+
+# Custom class for the rotated CSV segments
+class LogArchive:
+    """Rotated, gzip-compressed segments of the CSV log plus the live file
+
+    Segments live in <log name>_segments/ next to the log, named after their
+    first timestamp, and manifest.json lists each one's time range and row
+    count so readers can skip segments outside the window they want.
+    Only the log writer thread calls note_rows() and rotate().
+    Readers never hold the live file open, so rotation can always replace it.
+    """
+    def __init__(self, path, max_bytes=LOG_ROTATE_BYTES, max_age=LOG_ROTATE_AGE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.segments_dir = f"{os.path.splitext(path)[0]}_segments"
+        self.manifest_path = os.path.join(self.segments_dir, "manifest.json")
+        self.segments = self._load_manifest()
+        # [oldest timestamp, newest timestamp, rows] of the live file, scanned on first use. Rows are not
+        # written in time order (a scan is logged when its window closes, stamped when it opened), so
+        # these are the min and max rather than the first and last row.
+        self.live = None
+        self.lock = threading.Lock()  # Held while the segments and the live file change together
+
+    def note_rows(self, rows):
+        """Account for rows just appended to the live file"""
+        if self.live is None:
+            self.live = self._scan_live()  # Already includes rows
+            return
+        for row in rows:
+            if self.live[0] is None or row[0] < self.live[0]:
+                self.live[0] = row[0]
+            if self.live[1] is None or row[0] > self.live[1]:
+                self.live[1] = row[0]
+            self.live[2] += 1
+
+    def should_rotate(self):
+        if self.live is None:
+            self.live = self._scan_live()
+        if not self.live[2]:
+            return False
+        try:
+            if os.path.getsize(self.path) >= self.max_bytes:
+                return True
+            oldest = datetime.datetime.strptime(self.live[0], TIMESTAMP_FORMAT)
+        except (OSError, ValueError):
+            return False
+        return (datetime.datetime.now() - oldest).total_seconds() >= self.max_age
+
+    def rotate(self):
+        """Compress the live file into a new segment and start an empty one"""
+        first, last, rows = self.live if self.live is not None else self._scan_live()
+        if not rows:
+            return None
+        os.makedirs(self.segments_dir, exist_ok=True)
+        name = self._segment_name(first)
+        segment_path = os.path.join(self.segments_dir, name)
+        temp_path = f"{segment_path}.tmp"
+        with open(self.path, "rb") as src, gzip.open(temp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(temp_path, segment_path)
+
+        # List the segment before the live file goes, a crash in between duplicates rows rather than losing them
+        segment = {"file": name, "start": first, "end": last, "rows": rows}
+        with self.lock:
+            self.segments = self.segments + [segment]
+            self._save_manifest()
+            os.remove(self.path)
+        self.live = [None, None, 0]
+        print(f"Rotated {rows} log rows into {segment_path}")
+        return segment
+
+    def rows(self, start=None, end=None):
+        """Yield [timestamp, card_id, name, status, door, repeats] rows, oldest first, optionally within [start, end]"""
+        # Take the segment list and a copy of the live file together, so rows rotated in between
+        # are in exactly one of them. The manifest is read again afterwards in case another
+        # process (the daemon) rotated meanwhile, the lock only covers this process's writer.
+        while True:
+            with self.lock:
+                segments = self._load_manifest()
+                try:
+                    with open(self.path, "r", newline='') as f:
+                        live = f.read()  # At most LOG_ROTATE_BYTES
+                except FileNotFoundError:
+                    live = ""  # Just rotated, nothing live yet
+            if self._load_manifest() == segments:
+                break
+
+        for segment in segments:
+            if self._outside(segment, start, end):
+                continue
+            segment_path = os.path.join(self.segments_dir, segment["file"])
+            with gzip.open(segment_path, "rt", newline='') as f:
+                yield from self._filter(csv.reader(f), start, end)
+        yield from self._filter(csv.reader(io.StringIO(live, newline='')), start, end)
+
+    def count_rows(self, start=None, end=None):
+        """Upper bound on the rows rows(start, end) will read, for progress bars"""
+        total = sum(segment["rows"] for segment in self._load_manifest() if not self._outside(segment, start, end))
+        live = self.live if self.live is not None else self._scan_live()
+        return total + live[2]
+
+    def clear(self):
+        """Delete every segment, the manifest and the live rows"""
+        with self.lock:
+            for segment in self.segments:
+                try:
+                    os.remove(os.path.join(self.segments_dir, segment["file"]))
+                except FileNotFoundError:
+                    pass
+            self.segments = []
+            self._save_manifest()
+            with open(self.path, "w", newline='') as f:
+                csv.writer(f).writerow(LOG_HEADER)
+        self.live = [None, None, 0]
+
+    def _filter(self, reader, start, end):
+        for row in reader:
+            if not row or row[0] == LOG_HEADER[0]:
+                continue
+            if (start is not None and row[0] < start) or (end is not None and row[0] > end):
+                continue
+            yield event_row(row)
+
+    def _outside(self, segment, start, end):
+        """True if every row of the segment is outside [start, end]"""
+        if segment["start"] > segment["end"]:
+            return False  # Listed from its first and last rows by an older version, the range is unreliable
+        return (start is not None and segment["end"] < start) or (end is not None and segment["start"] > end)
+
+    def _scan_live(self):
+        first, last, rows = None, None, 0
+        try:
+            with open(self.path, "r", newline='') as f:
+                for row in csv.reader(f):
+                    if not row or row[0] == LOG_HEADER[0]:
+                        continue
+                    if first is None or row[0] < first:
+                        first = row[0]
+                    if last is None or row[0] > last:
+                        last = row[0]
+                    rows += 1
+        except FileNotFoundError:
+            pass
+        return [first, last, rows]
+
+    def _segment_name(self, first):
+        try:
+            stamp = datetime.datetime.strptime(first, TIMESTAMP_FORMAT).strftime("%Y-%m-%d_%H%M%S")
+        except (TypeError, ValueError):
+            stamp = datetime.datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        name, counter = f"{stamp}.csv.gz", 1
+        while os.path.exists(os.path.join(self.segments_dir, name)):
+            counter += 1
+            name = f"{stamp}_{counter}.csv.gz"
+        return name
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            print(f"Error loading log manifest: {e}")
+            return []
+
+    def _save_manifest(self):
+        os.makedirs(self.segments_dir, exist_ok=True)
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.segments, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+# Custom class for scans waiting on their cooldown window
+class ScanLog:
+    """Turns the engine's card and card_done events into one log row per scan
+
+    A scan is remembered when its card event arrives and written, with the
+    number of repeats folded into it, when its card_done event arrives.
+    Open scans are also recorded in the writer's event store, from the
+    writer thread, so a crash or kill in between doesn't lose them: any the
+    store still holds are written, without their repeats, on the next start.
+    """
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = {}  # (door, uid) -> [timestamp, card_id, name, status, door]
+        if writer.store is not None:
+            leftover = writer.store.open_scans()
+            for row in leftover:
+                writer.write(row + [0])
+            if leftover:
+                print(f"Logged {len(leftover)} scans left open by the last run")
+
+    def opened(self, door, uid, name, is_authorized):
+        timestamp = datetime.datetime.now().strftime(TIMESTAMP_FORMAT)
+        status = "ACCESS GRANTED" if is_authorized else "ACCESS DENIED"
+        row = [timestamp, uid, name, status, door]
+        self.pending[(door, uid)] = row
+        self.writer.open_scan(row)
+
+    def closed(self, door, uid, repeats):
+        row = self.pending.pop((door, uid), None)
+        if row is not None:
+            self.writer.write(row + [repeats])
+
+    def suppressed(self, door, count, cards):
+        """Write the unknown cards the engine rate limited, one RATE LIMITED row per card
+
+        cards are (uid, first read as time.time(), reads). The rows are denied
+        reads, but their own status keeps them out of the denied-card rollups.
+        """
+        for uid, first, reads in cards:
+            timestamp = datetime.datetime.fromtimestamp(first).strftime(TIMESTAMP_FORMAT)
+            self.writer.write([timestamp, uid, "Unknown User", "RATE LIMITED", door, reads - 1])
+
+    def close_all(self):
+        """Write every scan still waiting, used at shutdown"""
+        for row in self.pending.values():
+            self.writer.write(row + [0])
+        self.pending.clear()
+
+# Custom class for the buffered access log
+class LogWriter:
+    """Appends access rows to the CSV log from a background thread
+
+    Rows are queued by write() and committed in groups, when LOG_BATCH_SIZE
+    rows are waiting or LOG_FLUSH_INTERVAL has passed since the oldest one,
+    so a burst of scans costs one file open instead of one per scan.
+    Each batch also goes to the EventStore, if one is given, in one transaction,
+    and the LogArchive, if one is given, rotates the CSV after the batch.
+    Scans queued by open_scan() are recorded in the store with the next batch.
+    """
+    def __init__(self, path, store=None, batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL,
+                 queue_size=LOG_QUEUE_SIZE, on_batch=None, archive=None):
+        self.path = path
+        self.store = store
+        self.archive = archive
+        self.on_batch = on_batch  # Called with (rows, seconds) after every committed batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.lock = threading.Lock()
+        self.upgraded = False  # Set once the log file on disk has the current header
+        self.csv_written = 0  # Rows of the pending batch already in the CSV, a retry must not append them again
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def write(self, row):
+        """Queue one row, blocks only if the writer is LOG_QUEUE_SIZE rows behind"""
+        self.start()
+        self.queue.put(list(row))
+
+    def open_scan(self, row):
+        """Queue a [timestamp, card_id, name, status, door] scan to record as open in the store"""
+        self.start()
+        self.queue.put(tuple(row))
+
+    def flush(self, durable=True, timeout=None):
+        """Wait until every queued row is written (and fsynced if durable)"""
+        if self.thread is None:
+            return True
+        request = _FlushRequest(durable)
+        self.queue.put(request)
+        return request.done.wait(timeout)
+
+    def close(self):
+        """Write everything durably and stop the writer thread"""
+        if self.thread is None:
+            return
+        self.flush(durable=True)
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+    def _run(self):
+        batch = []
+        opened = []  # Open scans (tuples) waiting to be recorded with the batch
+        deadline = None
+        while True:
+            timeout = None if not (batch or opened) else max(0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False  # Time threshold reached
+
+            if isinstance(item, (list, tuple)):
+                if not (batch or opened):
+                    deadline = time.monotonic() + self.flush_interval
+                (batch if isinstance(item, list) else opened).append(item)
+                if len(batch) + len(opened) < self.batch_size:
+                    continue
+
+            # Size or time threshold, flush request or shutdown: commit the batch
+            durable = isinstance(item, _FlushRequest) and item.durable
+            if batch or opened or durable:
+                try:
+                    self._write_batch(batch, durable, opened)
+                    batch = []
+                    opened = []
+                except Exception as e:
+                    # Keep the rows and try again on the next threshold
+                    print(f"Error writing access log: {e}")
+                    deadline = time.monotonic() + self.flush_interval
+
+            if isinstance(item, _FlushRequest):
+                item.done.set()
+            elif item is None:
+                if self.store is not None:
+                    self.store.close()
+                return
+
+    def _write_batch(self, rows, durable, opened=()):
+        start = time.perf_counter()
+        if not self.upgraded:
+            upgrade_log_file(self.path)
+            self.upgraded = True
+        if rows or durable:
+            with open(self.path, "a", newline='') as f:
+                writer = csv.writer(f)
+                # Create log file header if the file is new
+                if f.tell() == 0:
+                    writer.writerow(LOG_HEADER)
+                writer.writerows(rows[self.csv_written:])
+                if durable:
+                    f.flush()
+                    os.fsync(f.fileno())
+        self.csv_written = len(rows)
+        if self.store is not None and (rows or durable or opened):
+            self.store.append(rows, durable, opened)
+        self.csv_written = 0
+        if self.on_batch is not None and rows:
+            self.on_batch(rows, time.perf_counter() - start)
+        if self.archive is not None and rows:
+            self.archive.note_rows(rows)
+            if self.archive.should_rotate():
+                try:
+                    self.archive.rotate()
+                except Exception as e:
+                    # The rows are safe in the live file, rotation is retried after the next batch
+                    print(f"Error rotating access log: {e}")
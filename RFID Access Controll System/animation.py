@@ -0,0 +1,82 @@
+import math, time
+
+# — Configuration —
+FRAME_INTERVAL = 0.04  # in seconds, fastest frame rate the clock runs at (25 fps)
+FRAME_BUDGET = 0.008  # in seconds, animation work allowed per tick before the rest wait a frame
+
+# Custom class for the kiosk's animations
+class FrameClock:
+    """Runs every animation from one Tk after() tick
+
+    An animation is a step(t) function called with the seconds since it
+    started; it draws that moment and returns False when it is finished.
+    Because steps draw from t rather than a frame counter, a late tick simply
+    skips the frames it missed. Each animation belongs to a screen, and show()
+    cancels everything that belongs to another screen. The tick is only
+    scheduled while something is animating, and never more often than the
+    fastest animation needs.
+    """
+    def __init__(self, root, on_frame=None):
+        self.root = root
+        self.on_frame = on_frame  # Called with the CPU seconds each tick used
+        self.animations = {}  # name -> [step, screen, interval, started, next due]
+        self.job = None
+        self.due = None
+        self.dropped = 0
+
+    def start(self, name, step, screen, fps=1 / FRAME_INTERVAL):
+        """Start (or restart) an animation, replacing any running under the same name"""
+        now = time.perf_counter()
+        self.animations[name] = [step, screen, max(1 / fps, FRAME_INTERVAL), now, now]
+        self._schedule(now)
+
+    def cancel(self, name):
+        self.animations.pop(name, None)
+
+    def show(self, screen):
+        """Cancel every animation that doesn't belong to screen"""
+        for name in [name for name, animation in self.animations.items() if animation[1] != screen]:
+            del self.animations[name]
+
+    def _schedule(self, now):
+        if not self.animations:
+            return
+        due = min(animation[4] for animation in self.animations.values())
+        if self.job is not None:
+            if due >= self.due:
+                return  # The pending tick is early enough
+            self.root.after_cancel(self.job)
+        self.due = due
+        self.job = self.root.after(max(0, math.ceil((due - now) * 1000)), self._tick)
+
+    def _tick(self):
+        self.job = None
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+
+        # Oldest due first, so an animation that missed the budget goes first next time
+        for name, animation in sorted(self.animations.items(), key=lambda item: item[1][4]):
+            step, screen, interval, started, due = animation
+            if due > start:
+                continue
+            if time.perf_counter() - start > FRAME_BUDGET:
+                self.dropped += 1
+                continue  # Over budget, this one waits for the next tick
+            if self.animations.get(name) is not animation:
+                continue  # Cancelled by an earlier step
+            now = time.perf_counter()
+            self.dropped += int((now - due) / interval)  # Frames the event loop was too busy for
+            try:
+                running = step(now - started)
+            except Exception as e:
+                print(f"Error in animation {name}: {e}")
+                running = False
+            if not running:
+                if self.animations.get(name) is animation:
+                    del self.animations[name]
+                continue
+            animation[4] = now + interval
+
+        if self.on_frame is not None:
+            self.on_frame(time.process_time() - cpu_start)
+        self._schedule(time.perf_counter())
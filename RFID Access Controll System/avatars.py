@@ -0,0 +1,119 @@
+import argparse, os, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image  # ImageDraw is imported by the render functions, most callers only need the derivatives
+
+from user_store import UserStore
+
+# — Configuration —
+DISPLAY_SIZE = 320  # circular image shown on a granted scan (IMG_SIZE in rfid_gui)
+THUMB_SIZE = 100  # preview thumbnail in the admin panel
+USERS_DB_FILE = "users.db"
+
+def derivative_path(img_path, kind):
+    """Path of the 'display' or 'thumb' derivative stored next to the original photo"""
+    base = os.path.splitext(img_path)[0]
+    return f"{base}_{kind}.png"
+
+def fresh_derivative(img_path, kind):
+    """Return the derivative path if it exists and is not older than the original, else None"""
+    path = derivative_path(img_path, kind)
+    try:
+        if os.path.getmtime(path) >= os.path.getmtime(img_path):
+            return path
+    except OSError:
+        pass
+    return None
+
+def render_circular(img, size):
+    """Resize an image and cut it to a circle with a transparent background"""
+    from PIL import ImageDraw
+    img = img.convert("RGBA").resize((size, size), Image.LANCZOS)
+
+    # Create circular mask
+    mask = Image.new("L", (size, size), 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse((0, 0, size, size), fill=255)
+
+    # Paste image onto a transparent background using the mask
+    result = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    result.paste(img, (0, 0), mask)
+    return result
+
+def render_denied_composite(circle_img, size, color):
+    """Lay out the denied result like the scan canvas: ring, circular image and a cross badge"""
+    from PIL import ImageDraw
+    full = size + 40  # canvas is IMG_SIZE + 40 with the image centred
+    scale = 4  # draw shapes larger and shrink them for smooth edges
+
+    # Ring around the image (Tk draws a width-5 outline centred on the oval 10..size+30)
+    ring = Image.new("RGBA", (full * scale, full * scale), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(ring)
+    draw.ellipse((7.5 * scale, 7.5 * scale, (size + 32.5) * scale, (size + 32.5) * scale),
+                 outline=color, width=5 * scale)
+    result = ring.resize((full, full), Image.LANCZOS)
+    result.alpha_composite(circle_img.convert("RGBA"), (20, 20))
+
+    # Badge with a cross, centred where the canvas version put it
+    badge_x, badge_y = size - 40, 40
+    badge = Image.new("RGBA", (full * scale, full * scale), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(badge)
+    draw.ellipse(((badge_x - 15) * scale, (badge_y - 15) * scale,
+                  (badge_x + 15) * scale, (badge_y + 15) * scale), fill=color)
+    arm = 5 * scale
+    for dx in (-arm, arm):
+        draw.line((badge_x * scale - dx, badge_y * scale - arm, badge_x * scale + dx, badge_y * scale + arm),
+                  fill="white", width=3 * scale)
+    result.alpha_composite(badge.resize((full, full), Image.LANCZOS))
+    return result
+
+def make_derivatives(img_path):
+    """Write the circular display image and the preview thumbnail for one photo"""
+    with Image.open(img_path) as img:
+        # Let the JPEG decoder downscale while decoding, phone photos are huge
+        img.draft("RGB", (DISPLAY_SIZE * 2, DISPLAY_SIZE * 2))
+        img.load()
+
+        display_path = derivative_path(img_path, "display")
+        render_circular(img, DISPLAY_SIZE).save(display_path, optimize=True)
+
+        thumb_path = derivative_path(img_path, "thumb")
+        img.convert("RGBA").resize((THUMB_SIZE, THUMB_SIZE), Image.LANCZOS).save(thumb_path, optimize=True)
+    return display_path, thumb_path
+
+def load_thumbnail(img_path):
+    """Preview image for the admin panel, from the thumbnail derivative when available"""
+    thumb_path = fresh_derivative(img_path, "thumb")
+    if thumb_path:
+        return Image.open(thumb_path)
+    img = Image.open(img_path)
+    img.draft("RGB", (THUMB_SIZE * 2, THUMB_SIZE * 2))
+    return img.resize((THUMB_SIZE, THUMB_SIZE), Image.LANCZOS)
+
+def rebuild_all(users_db=USERS_DB_FILE, workers=None):
+    """Regenerate derivatives for every user in parallel, returns (done, errors)"""
+    users = UserStore(users_db).load()
+
+    done, errors = 0, []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(make_derivatives, user["image"]): card_id
+                   for card_id, user in users.items()}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                done += 1
+            except Exception as e:
+                errors.append((futures[future], str(e)))
+    return done, errors
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild avatar derivatives for all registered users")
+    parser.add_argument("--users", default=USERS_DB_FILE, help="user store (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    done, errors = rebuild_all(args.users, args.workers)
+    for card_id, error in errors:
+        print(f"{card_id}: {error}")
+    print(f"Rebuilt {done} avatars, {len(errors)} errors in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,97 @@
+import argparse, csv, os, shutil, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import avatars
+from user_store import UserStore, normalize_uid, is_valid_uid
+
+# — Configuration —
+USERS_DB_FILE = "users.db"
+IMAGES_DIR = "user_images"
+PROGRESS_EVERY = 100  # print progress after this many photos
+
+def read_manifest(manifest_path):
+    """Yield (row number, card ID, name, photo path) from a CSV with card_id, name and photo columns"""
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, "r", newline='') as f:
+        reader = csv.DictReader(f)
+        # Accept headers like "Card ID" or "card_id", and "image" for the photo
+        reader.fieldnames = [name.strip().lower().replace(" ", "_") for name in reader.fieldnames or []]
+        for row_number, row in enumerate(reader, start=2):
+            photo = (row.get("photo") or row.get("image") or "").strip()
+            if photo and not os.path.isabs(photo):
+                photo = os.path.join(base_dir, photo)
+            yield row_number, row.get("card_id") or "", (row.get("name") or "").strip(), photo
+
+def validate_manifest(manifest_path):
+    """Split manifest rows into valid entries and (row, card ID, error) tuples"""
+    entries, errors, seen = [], [], set()
+    for row_number, raw_uid, name, photo in read_manifest(manifest_path):
+        card_id = normalize_uid(raw_uid)
+        if not is_valid_uid(card_id):
+            errors.append((row_number, raw_uid, "invalid card ID"))
+        elif card_id in seen:
+            errors.append((row_number, card_id, "duplicate card ID in manifest"))
+        elif not name:
+            errors.append((row_number, card_id, "missing name"))
+        elif not os.path.isfile(photo):
+            errors.append((row_number, card_id, f"photo not found: {photo}"))
+        else:
+            seen.add(card_id)
+            entries.append((row_number, card_id, name, photo))
+    return entries, errors
+
+def prepare_photo(card_id, photo_path, images_dir):
+    """Copy a photo into the images directory and pre-render its derivatives"""
+    extension = os.path.splitext(photo_path)[1]
+    new_image_path = os.path.join(images_dir, f"{card_id}{extension}")
+    shutil.copy2(photo_path, new_image_path)
+    avatars.make_derivatives(new_image_path)
+    return new_image_path
+
+def bulk_enroll(manifest_path, users_db=USERS_DB_FILE, images_dir=IMAGES_DIR, workers=None):
+    """Enroll every valid manifest row, returns (enrolled count, errors)"""
+    entries, errors = validate_manifest(manifest_path)
+    os.makedirs(images_dir, exist_ok=True)
+    print(f"{len(entries)} valid rows, {len(errors)} rejected")
+
+    # Photos are the slow part, so they go through a process pool
+    users = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(prepare_photo, card_id, photo, images_dir): (row_number, card_id, name)
+                   for row_number, card_id, name, photo in entries}
+        for done, future in enumerate(as_completed(futures), start=1):
+            row_number, card_id, name = futures[future]
+            try:
+                users[card_id] = {"name": name, "image": future.result()}
+            except Exception as e:
+                errors.append((row_number, card_id, f"photo error: {e}"))
+            if done % PROGRESS_EVERY == 0 or done == len(futures):
+                print(f"Processed {done}/{len(futures)} photos")
+
+    # One transaction for the whole batch
+    UserStore(users_db).put_many(users)
+    errors.sort()
+    return len(users), errors
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enroll many cards from a CSV manifest (card_id, name, photo)")
+    parser.add_argument("manifest", help="CSV file with card_id, name and photo columns")
+    parser.add_argument("--users", default=USERS_DB_FILE, help="user store (default: %(default)s)")
+    parser.add_argument("--images", default=IMAGES_DIR, help="user images directory (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--errors", default=None, help="write the per-row error report to this CSV file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    enrolled, errors = bulk_enroll(args.manifest, args.users, args.images, args.workers)
+
+    # Per-row error report
+    if args.errors:
+        with open(args.errors, "w", newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Row", "Card ID", "Error"])
+            writer.writerows(errors)
+    else:
+        for row_number, card_id, error in errors:
+            print(f"Row {row_number} ({card_id}): {error}")
+    print(f"Enrolled {enrolled} users, {len(errors)} errors in {time.perf_counter() - start:.1f}s")
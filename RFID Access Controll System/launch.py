@@ -0,0 +1,5 @@
+import time
+
+# Imported first by the entry points (rfid_gui.py, access_daemon.py), so their
+# startup times are measured from launch and include every other import
+LAUNCH_TIME = time.perf_counter()
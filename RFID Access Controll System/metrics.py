@@ -0,0 +1,149 @@
+import bisect, os, threading, time
+from collections import deque
+
+# — Configuration —
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)  # in seconds
+STAGES = (
+    ("serial_read", "Serial read"),
+    ("uid_normalize", "UID normalize"),
+    ("table_lookup", "Table lookup"),
+    ("serial_write", "Serial write"),
+    ("log_write", "Log write"),
+    ("image_load", "Image load"),
+    ("canvas_render", "Canvas render"),
+    ("animation_frame", "Animation frame (CPU)"),
+)
+
+def label_value(value):
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# Custom class for stage timings
+class Histogram:
+    """Prometheus-style histogram of durations in seconds"""
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile, None when empty"""
+        if not self.count:
+            return None
+        target = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= target:
+                return bound
+        return float("inf")
+
+# Custom class for all scan metrics
+class Metrics:
+    """Counters and per-stage histograms for scans, shared by the GUI thread and the log writer"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {stage: Histogram() for stage, _ in STAGES}
+        self.scans = {}  # (door, status) -> count
+        self.recent = deque()  # scan times in the last minute
+        self.startup = {}  # phase -> seconds from launch
+        self.started = time.time()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.stages[stage].observe(seconds)
+
+    def observe_many(self, timings):
+        """Record a {stage: seconds} dict, e.g. the engine's timings for one card"""
+        with self.lock:
+            for stage, seconds in timings.items():
+                self.stages[stage].observe(seconds)
+
+    def count_scan(self, door, granted):
+        now = time.monotonic()
+        with self.lock:
+            key = (door, "granted" if granted else "denied")
+            self.scans[key] = self.scans.get(key, 0) + 1
+            self.recent.append(now)
+            self._trim(now)
+
+    def count_suppressed(self, door, count):
+        """Unknown cards the engine answered but did not report, over its rate limit"""
+        with self.lock:
+            key = (door, "suppressed")
+            self.scans[key] = self.scans.get(key, 0) + count
+
+    def mark_startup(self, phase, seconds):
+        """Record how long after launch a startup phase finished, the first time only"""
+        with self.lock:
+            if phase in self.startup:
+                return False
+            self.startup[phase] = seconds
+        print(f"Startup: {phase} after {seconds * 1000:.0f} ms")
+        return True
+
+    def scans_per_minute(self):
+        with self.lock:
+            self._trim(time.monotonic())
+            return len(self.recent)
+
+    def totals(self):
+        """(granted, denied) over all doors"""
+        with self.lock:
+            granted = sum(count for (_, status), count in self.scans.items() if status == "granted")
+            denied = sum(count for (_, status), count in self.scans.items() if status == "denied")
+        return granted, denied
+
+    def to_prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        granted, denied = self.totals()
+        per_minute = self.scans_per_minute()
+        lines = [
+            "# HELP rfid_scans_total Card scans by door and decision (suppressed: unknown cards over the rate limit).",
+            "# TYPE rfid_scans_total counter",
+        ]
+        with self.lock:
+            for (door, status), count in sorted(self.scans.items()):
+                lines.append(f'rfid_scans_total{{door="{label_value(door)}",status="{status}"}} {count}')
+            lines += [
+                "# HELP rfid_scans_per_minute Card scans in the last 60 seconds.",
+                "# TYPE rfid_scans_per_minute gauge",
+                f"rfid_scans_per_minute {per_minute}",
+                "# HELP rfid_grant_ratio Share of scans that were granted.",
+                "# TYPE rfid_grant_ratio gauge",
+                f"rfid_grant_ratio {granted / (granted + denied) if granted + denied else 0}",
+                "# HELP rfid_startup_seconds Time from launch to each startup phase.",
+                "# TYPE rfid_startup_seconds gauge",
+            ]
+            for phase, seconds in self.startup.items():
+                lines.append(f'rfid_startup_seconds{{phase="{phase}"}} {seconds}')
+            lines += [
+                "# HELP rfid_stage_seconds Time spent in each stage of a scan.",
+                "# TYPE rfid_stage_seconds histogram",
+            ]
+            for stage, histogram in self.stages.items():
+                total = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    total += count
+                    lines.append(f'rfid_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {total}')
+                lines.append(f'rfid_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'rfid_stage_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'rfid_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write the metrics file atomically, so the node exporter never reads half a file"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(temp_path, path)
+
+    def _trim(self, now):
+        while self.recent and now - self.recent[0] > 60:
+            self.recent.popleft()
@@ -0,0 +1,144 @@
+import argparse, math, os, pty, random, select, time, tty
+
+from user_store import UserStore
+
+# — Configuration —
+USERS_DB_FILE = "users.db"
+REPLY_TIMEOUT = 2.0  # in seconds, how long a scan waits for the '1'/'0' reply
+
+# Custom class for the simulated reader
+class ReaderSimulator:
+    """Pseudo-terminal stand-in for the Arduino running sketch_apr29a.ino
+
+    Point the app's port at sim.port. Each scan writes the UID as lower-case
+    hex plus CRLF (Serial.println), waits for the one-byte reply and then
+    drains anything else, just like the sketch.
+    """
+    def __init__(self):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+    def scan(self, uid, timeout=REPLY_TIMEOUT):
+        """Send one UID and wait for the reply, returns (reply or None, seconds)"""
+        start = time.perf_counter()
+        os.write(self.master, uid.lower().encode() + b"\r\n")
+        ready, _, _ = select.select([self.master], [], [], timeout)
+        if not ready:
+            return None, time.perf_counter() - start
+        reply = os.read(self.master, 1)
+        elapsed = time.perf_counter() - start
+
+        # Clear any remaining data from serial
+        while select.select([self.master], [], [], 0)[0]:
+            os.read(self.master, 1024)
+        return reply.decode(errors="ignore"), elapsed
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+# — Scan streams —
+def random_uid(rng):
+    return "".join(rng.choice("0123456789ABCDEF") for _ in range(8))
+
+def random_stream(known, count, unknown_ratio=0.2, seed=None):
+    """Yield count card IDs, a mix of known cards and random unknown ones"""
+    rng = random.Random(seed)
+    known = list(known)
+    last = None
+    for _ in range(count):
+        while True:
+            if known and rng.random() >= unknown_ratio:
+                uid = rng.choice(known)
+            else:
+                uid = random_uid(rng)
+            # A real card can't be presented twice in a row without leaving the field
+            if uid != last or len(known) < 2:
+                break
+        last = uid
+        yield uid
+
+def script_stream(path):
+    """Yield card IDs from a file with one UID per line ('#' starts a comment)"""
+    with open(path, "r") as f:
+        for line in f:
+            uid = line.split("#", 1)[0].strip()
+            if uid:
+                yield uid
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def percentile_ms(values, pct):
+    value = percentile(values, pct)
+    return None if value is None else value * 1000
+
+def run(sim, uids, rate, known=()):
+    """Replay a scan stream at rate scans per second, returns a summary dict"""
+    known = {uid.upper() for uid in known}
+    interval = 1.0 / rate if rate > 0 else 0
+    latencies, granted, denied, timeouts, wrong = [], 0, 0, 0, 0
+    next_time = time.perf_counter()
+
+    for uid in uids:
+        # Pace the stream
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        next_time += interval
+
+        reply, elapsed = sim.scan(uid)
+        if reply is None:
+            timeouts += 1
+            continue
+        latencies.append(elapsed)
+        if reply == "1":
+            granted += 1
+        else:
+            denied += 1
+        if known and (reply == "1") != (uid.upper() in known):
+            wrong += 1
+
+    return {
+        "scans": granted + denied + timeouts,
+        "granted": granted,
+        "denied": denied,
+        "timeouts": timeouts,
+        "wrong_replies": wrong,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated MFRC522 reader on a pseudo-terminal")
+    stream = parser.add_mutually_exclusive_group(required=True)
+    stream.add_argument("--script", help="file with one card ID per line to replay")
+    stream.add_argument("--random", type=int, metavar="COUNT", help="send COUNT random scans")
+    parser.add_argument("--rate", type=float, default=5.0, help="scans per second (default: %(default)s)")
+    parser.add_argument("--unknown", type=float, default=0.2, help="share of unknown cards in random mode")
+    parser.add_argument("--users", default=USERS_DB_FILE, help="user store with the known cards")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for a repeatable stream")
+    parser.add_argument("--wait", type=float, default=5.0, help="seconds to wait for the app to open the port")
+    args = parser.parse_args()
+
+    known = list(UserStore(args.users).load()) if os.path.exists(args.users) else []
+    sim = ReaderSimulator()
+    print(f"Simulated reader on {sim.port} (start the app with RFID_PORT={sim.port})")
+    time.sleep(args.wait)
+
+    if args.script:
+        uids = script_stream(args.script)
+    else:
+        uids = random_stream(known, args.random, args.unknown, args.seed)
+    summary = run(sim, uids, args.rate, known)
+    for key, value in summary.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+    sim.close()
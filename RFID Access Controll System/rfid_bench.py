@@ -0,0 +1,192 @@
+import argparse, json, os, platform, shutil, subprocess, sys, tempfile, threading, time
+
+from PIL import Image
+
+from access_engine import AccessEngine
+from access_log import EventStore, ScanLog
+from reader_sim import ReaderSimulator, random_stream, run, percentile_ms
+from user_store import UserStore
+
+# — Configuration —
+USER_COUNTS = (100, 10000, 100000)
+LOG_ROWS = (0, 200000)
+SCANS = 200
+RATE = 20.0  # scans per second
+ACTIVE_CARDS = 50  # known cards that show up in the scan stream
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def make_workdir(users, log_rows):
+    """Temporary app directory with a user store, user photos and an access log of the given sizes"""
+    workdir = tempfile.mkdtemp(prefix="rfid_bench_")
+    images_dir = os.path.join(workdir, "user_images")
+    os.makedirs(images_dir)
+
+    # Full-size photos for the cards in the scan stream, the rest share one path
+    photo = Image.new("RGB", (1600, 1200), (120, 160, 200))
+    table = {}
+    for i in range(users):
+        card_id = f"{i:08X}"
+        image = os.path.join("user_images", f"{card_id}.jpg" if i < ACTIVE_CARDS else "shared.jpg")
+        table[card_id] = {"name": f"User {i}", "image": image}
+    for i in range(min(users, ACTIVE_CARDS)):
+        photo.save(os.path.join(workdir, table[f"{i:08X}"]["image"]))
+    photo.save(os.path.join(images_dir, "shared.jpg"))
+    UserStore(os.path.join(workdir, "users.db"), json_path=os.path.join(workdir, "users.json")).put_many(table)
+
+    store = EventStore(os.path.join(workdir, "access_logs.db"))
+    store.migrate_csv(os.path.join(workdir, "access_logs.csv"))
+    for start in range(0, log_rows, 10000):
+        store.append([["2025-01-01 00:00:00", f"{i:08X}", "User", "ACCESS GRANTED", "Main"]
+                      for i in range(start, min(log_rows, start + 10000))])
+    store.close()
+    return workdir
+
+def stream_for(workdir, scans, seed):
+    known = sorted(UserStore(os.path.join(workdir, "users.db")).load())
+    return known, list(random_stream(known[:ACTIVE_CARDS], scans, seed=seed))
+
+# — Scan to reply —
+def bench_reply(workdir, scans, rate):
+    """UID sent by the simulated reader -> '1'/'0' reply received"""
+    known, uids = stream_for(workdir, scans, seed=1)
+    sim = ReaderSimulator()
+    engine = AccessEngine([{"door": "Bench", "port": sim.port, "baud": 9600}])
+    engine.publish_users(dict.fromkeys(known))
+    engine.start()
+    time.sleep(0.5)  # Let the engine open the port
+    try:
+        summary = run(sim, uids, rate, known)
+    finally:
+        engine.stop()
+        sim.close()
+    return summary
+
+# — Scan to render —
+def bench_render(workdir, scans, rate, cache):
+    """UID received by the engine -> show_user done drawing, run in a child process with the GUI"""
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--render-case", workdir,
+                             str(scans), str(rate), cache],
+                            cwd=workdir, capture_output=True, text=True)
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        return {"skipped": (result.stderr.strip().splitlines() or ["failed"])[-1]}
+    return json.loads(lines[-1])
+
+def render_case(workdir, scans, rate, cache):
+    """Child side of bench_render: imports the GUI and times every scan it draws"""
+    sys.path.insert(0, APP_DIR)
+    os.chdir(workdir)
+    import rfid_gui
+    rfid_gui.open_users()
+    rfid_gui.open_log()
+    rfid_gui.build_window()  # Needs a display
+    rfid_gui.scan_log = ScanLog(rfid_gui.log_writer)
+
+    known, uids = stream_for(workdir, scans, seed=2)
+    latencies = []
+    received_at = {}
+
+    sim = ReaderSimulator()
+    # Every scan should render, so no cooldown and no unknown-card limit
+    rfid_gui.engine = AccessEngine([{"door": "Bench", "port": sim.port, "baud": 9600}],
+                                   cooldown=0, unknown_rate=None)
+    rfid_gui.engine.publish_users(rfid_gui.USERS)
+    rfid_gui.engine.start()
+
+    # Remember when the engine received each card
+    poll_events = rfid_gui.engine.poll_events
+    def recording_poll_events():
+        events = poll_events()
+        for event in events:
+            if event[0] == "card":
+                received_at[event[2]] = event[4]
+        return events
+    rfid_gui.engine.poll_events = recording_poll_events
+
+    # Time show_user until Tk has drawn the result
+    show_user = rfid_gui.show_user
+    def timed_show_user(uid):
+        if cache == "cold":
+            rfid_gui.avatar_cache.entries.clear()
+            rfid_gui.avatar_cache.used = 0
+        show_user(uid)
+        rfid_gui.root.update_idletasks()
+        received = received_at.pop(uid.strip().upper(), None)
+        if received is not None:
+            latencies.append(time.perf_counter() - received)
+    rfid_gui.show_user = timed_show_user
+
+    if cache == "warm":
+        for card_id in known[:ACTIVE_CARDS]:
+            rfid_gui.avatar_cache.get(card_id, rfid_gui.USERS[card_id]["image"])
+
+    def drive():
+        time.sleep(0.5)
+        run(sim, uids, rate, known)
+        time.sleep(0.5)
+        rfid_gui.root.after(0, rfid_gui.root.quit)
+
+    rfid_gui.show_scanning_ui()
+    rfid_gui.root.after(rfid_gui.EVENT_POLL_TIME, rfid_gui.poll_engine_events)
+    threading.Thread(target=drive, daemon=True).start()
+    rfid_gui.root.mainloop()
+    rfid_gui.engine.stop()
+    rfid_gui.log_writer.close()
+    sim.close()
+
+    print(json.dumps({
+        "scans": len(latencies),
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+    }))
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=APP_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--render-case":
+        render_case(sys.argv[2], int(sys.argv[3]), float(sys.argv[4]), sys.argv[5])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Scan-to-reply and scan-to-render latency benchmarks")
+    parser.add_argument("--users", type=int, nargs="+", default=USER_COUNTS, help="user table sizes")
+    parser.add_argument("--log-rows", type=int, nargs="+", default=LOG_ROWS, help="access log sizes")
+    parser.add_argument("--scans", type=int, default=SCANS, help="scans per case (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=RATE, help="scans per second (default: %(default)s)")
+    parser.add_argument("--no-render", action="store_true", help="skip the GUI benchmarks")
+    parser.add_argument("--out", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "version": git_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scans": args.scans,
+        "rate": args.rate,
+        "results": [],
+    }
+    for users in args.users:
+        for log_rows in args.log_rows:
+            workdir = make_workdir(users, log_rows)
+            case = {"users": users, "log_rows": log_rows}
+            report["results"].append({"benchmark": "scan_to_reply", **case,
+                                      **bench_reply(workdir, args.scans, args.rate)})
+            print(f"scan_to_reply {case} done", file=sys.stderr)
+            if not args.no_render:
+                for cache in ("cold", "warm"):
+                    report["results"].append({"benchmark": "scan_to_render", "cache": cache, **case,
+                                              **bench_render(workdir, args.scans, args.rate, cache)})
+                    print(f"scan_to_render {case} {cache} done", file=sys.stderr)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
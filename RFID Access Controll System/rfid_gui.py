@@ -1,66 +1,56 @@
-import serial, threading, time, os, json, datetime
+from launch import LAUNCH_TIME  # First, so the startup times include the other imports
+import os, string, time, datetime
+from collections import OrderedDict
 from tkinter import *
-from tkinter import ttk, simpledialog, filedialog, messagebox
-from PIL import Image, ImageTk, ImageDraw
-import csv
-import shutil
+from tkinter import ttk, simpledialog, messagebox
+from access_engine import AccessEngine
+from access_daemon import DaemonClient, DAEMON_SOCKET
+from user_store import UserStore, UserTable, normalize_uid
+from metrics import Metrics, STAGES
+from animation import FrameClock
+from access_log import LogWriter, LogArchive, EventStore, ScanLog, TIMESTAMP_FORMAT, SEARCH_MIN_TRIGRAM, row_filter, export_rows
+import threading
+# PIL (and avatars, which needs it), shutil and filedialog are imported where they
+# are used, so none of them stand between launch and the first scan
 
 # — Configuration —
-PORT = 'COM5'
+PORT = os.environ.get("RFID_PORT", 'COM5')  # RFID_PORT points the app at another port, e.g. reader_sim.py
 BAUD = 9600
+# One entry per door; every reader shares the user table and the access log
+READERS = [
+    {"door": "Main", "port": PORT, "baud": BAUD},
+]
+READ_MODE = "blocking"  # "blocking" (read with timeout), "select" or "poll" (wait on the port's fd, POSIX only)
+EVENT_POLL_TIME = 20  # in milliseconds, how often the UI picks up engine events
 IMG_SIZE = 320
+AVATAR_CACHE_BYTES = 64 * 1024 * 1024  # memory cap for rendered avatars (~400 KB each)
 RESET_TIME = 3000  # in milliseconds
+TEXT_FADE_TIME = 0.04  # in seconds per character
+PULSE_PERIOD = 2.0  # in seconds, one grow-and-shrink of the waiting circle
+PULSE_FPS = 10  # the idle screen's only animation, kept slow so the kiosk idles cheaply
+LOGS_REFRESH_TIME = 5000  # in milliseconds
+LOGS_PAGE_SIZE = 100  # rows kept in the Logs tab at a time
+LOGS_PAGE_SIZES = (50, 100, 250, 500, 1000)
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "admin"
-USERS_FILE = "users.json"
+USERS_FILE = "users.json"  # Old user file, imported into the user store on first start
+USERS_DB_FILE = "users.db"
 LOGS_FILE = "access_logs.csv"
+LOGS_DB_FILE = "access_logs.db"  # Indexed copy of the access log (SQLite)
+METRICS_FILE = "rfid_metrics.prom"  # Prometheus text file for the node exporter's textfile collector
+METRICS_INTERVAL = 15000  # in milliseconds
+STATS_REFRESH_TIME = 1000  # in milliseconds
 IMAGES_DIR = "user_images"
 DENIED_IMAGE_PATH = "not_allowed.png"  # Transparent PNG image
 card_var = None
 status_var = None
 scan_btn = None
+engine = None
+attached = False  # True when a headless access daemon serves the doors and writes the log
+scan_log = None  # Logs scans when the GUI runs the engine itself, the daemon has its own
 
-# Ensure directories exist
-if not os.path.exists(IMAGES_DIR):
-    os.makedirs(IMAGES_DIR)
-
-# Load users from file
-def load_users():
-    if os.path.exists(USERS_FILE):
-        try:
-            with open(USERS_FILE, "r") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading users file: {e}")
-    return {}
-
-# Save users to file
-def save_users(users_data):
-    with open(USERS_FILE, "w") as f:
-        json.dump(users_data, f, indent=4)
-
-# Load or initialize users
-USERS = load_users()
-
-# Log access attempts
-def log_access(uid, name, status, timestamp=None):
-    if timestamp is None:
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Create log file if it doesn't exist
-    file_exists = os.path.exists(LOGS_FILE)
-    
-    with open(LOGS_FILE, "a", newline='') as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(["Timestamp", "Card ID", "Name", "Status"])
-        writer.writerow([timestamp, uid, name, status])
-
-# — Setup Window —
-root = Tk()
-root.title("Smart RFID Access Control")
-root.geometry("1000x700")
-root.resizable(True, True)
+# Scan counters and per-stage timings
+metrics = Metrics()
 
 # — Colors —
 colors = {
@@ -73,8 +63,50 @@ colors = {
     "secondary": "#6e6e73"
 }
 
-# Configure the root window
-root.configure(bg=colors["bg"])
+def users_changed(snapshot):
+    """Swap in the new snapshot and push the card table to the access engine"""
+    global USERS
+    USERS = snapshot
+    if engine is not None:
+        engine.publish_users(snapshot)
+
+def open_users():
+    """Open the user store and load the users"""
+    global user_table, USERS
+
+    # Ensure directories exist
+    if not os.path.exists(IMAGES_DIR):
+        os.makedirs(IMAGES_DIR)
+
+    # User store, one row per card (users.json is migrated automatically)
+    user_store = UserStore(USERS_DB_FILE, json_path=USERS_FILE)
+
+    # Users as an immutable snapshot; USERS is swapped, never modified in place
+    user_table = UserTable(user_store)
+    user_table.on_change(users_changed)
+
+    # Load or initialize users
+    try:
+        user_table.reload()
+    except Exception as e:
+        print(f"Error loading users: {e}")
+    USERS = user_table.snapshot
+
+def open_log():
+    """Open the access log: the event store, the rotated CSV segments and the log writer"""
+    global event_store, log_archive, log_writer
+
+    # Access event store, the existing CSV log is imported the first time it is opened
+    event_store = EventStore(LOGS_DB_FILE)
+    imported = event_store.migrate_csv(LOGS_FILE)
+    if imported:
+        print(f"Imported {imported} log entries from {LOGS_FILE} into {LOGS_DB_FILE}")
+
+    # Access log writer, rows are written in batches from a background thread
+    # to both the CSV log and the event store
+    log_archive = LogArchive(LOGS_FILE)
+    log_writer = LogWriter(LOGS_FILE, store=event_store, archive=log_archive,
+                           on_batch=lambda rows, seconds: metrics.observe("log_write", seconds))
 
 # Custom class for rounded corner frame
 class RoundedFrame(Canvas):
@@ -111,84 +143,113 @@ class RoundedFrame(Canvas):
 main_width, main_height = 600, 650  # Increased height to fit name label
 frame_radius = 15
 
-# Create the rounded frame container
-frame_container = RoundedFrame(
-    root, 
-    width=main_width, 
-    height=main_height, 
-    radius=frame_radius, 
-    bg=colors["white"], 
-    border_color=colors["secondary"], 
-    border_width=4
-)
-frame_container.place(relx=0.5, rely=0.5, anchor=CENTER)
-
-# Create inner content frame
-content_container = Frame(frame_container, bg=colors["white"])
-content_container.place(x=0, y=0, width=main_width, height=main_height)
-
-# — Header with gradient —
-header_frame = Frame(content_container, bg=colors["primary"], height=80)
-header_frame.pack(fill=X)
-
-header_label = Label(header_frame, text="Smart Access Control", 
-                    font=("Helvetica", 24, "bold"), fg=colors["white"], bg=colors["primary"])
-header_label.pack(pady=20)
-
-# — Content area —
-content_frame = Frame(content_container, bg=colors["white"])
-content_frame.pack(fill=BOTH, expand=True, padx=40, pady=30)
-
-# Create a frame for the initial options
-options_frame = Frame(content_frame, bg=colors["white"])
-options_frame.pack(fill=BOTH, expand=True)
-
-# Create a frame for the main RFID scanning functionality
-scanning_frame = Frame(content_frame, bg=colors["white"])
-
-# Status with modern font
-status_lbl = Label(scanning_frame, text="Ready to Scan", 
-                  font=("Helvetica", 36, "bold"), 
-                  fg=colors["text"], bg=colors["white"])
-status_lbl.pack(pady=(0, 20))
-
-# Canvas for the image with proper background color
-image_canvas = Canvas(scanning_frame, width=IMG_SIZE + 40, height=IMG_SIZE + 40,
-                    bg=colors["white"], highlightthickness=0)
-image_canvas.pack()
-
-# Clear space for name label
-spacer = Frame(scanning_frame, height=10, bg=colors["white"])
-spacer.pack()
-
-# Name display with nicer font
-name_frame = Frame(scanning_frame, bg=colors["white"])
-name_frame.pack(fill=X, pady=10)
-
-name_lbl = Label(name_frame, text="", 
-                font=("Helvetica", 28, "bold"), 
-                fg=colors["primary"], bg=colors["white"])
-name_lbl.pack(fill=X)
-
-# Add a footer with additional info
-footer_lbl = Label(scanning_frame, text="Please place your card on the reader", 
-                  font=("Helvetica", 14), 
-                  fg=colors["secondary"], bg=colors["white"])
-footer_lbl.pack(pady=(10, 20))
-
-# Add back button for scanning frame
-back_btn_frame = Frame(scanning_frame, bg=colors["white"])
-back_btn_frame.pack(fill=X, pady=10)
-
-back_btn = Button(back_btn_frame, text="Back to Main Menu", 
-                 font=("Helvetica", 12),
-                 bg=colors["primary"], fg=colors["white"],
-                 command=lambda: [stop_animation(), show_main_options()])
-back_btn.pack(pady=5)
+def build_window():
+    """Create the main window and the scanning screen"""
+    global root, animations, content_frame, options_frame, scanning_frame
+    global status_lbl, image_canvas, name_lbl, footer_lbl, scan_scene
+
+    # — Setup Window —
+    root = Tk()
+    root.title("Smart RFID Access Control")
+    root.geometry("1000x700")
+    root.resizable(True, True)
+    root.configure(bg=colors["bg"])
+
+    # Every animation runs from this one clock
+    animations = FrameClock(root, on_frame=lambda seconds: metrics.observe("animation_frame", seconds))
+
+    # Create the rounded frame container
+    frame_container = RoundedFrame(
+        root, 
+        width=main_width, 
+        height=main_height, 
+        radius=frame_radius, 
+        bg=colors["white"], 
+        border_color=colors["secondary"], 
+        border_width=4
+    )
+    frame_container.place(relx=0.5, rely=0.5, anchor=CENTER)
+
+    # Create inner content frame
+    content_container = Frame(frame_container, bg=colors["white"])
+    content_container.place(x=0, y=0, width=main_width, height=main_height)
+
+    # — Header with gradient —
+    header_frame = Frame(content_container, bg=colors["primary"], height=80)
+    header_frame.pack(fill=X)
+
+    header_label = Label(header_frame, text="Smart Access Control", 
+                        font=("Helvetica", 24, "bold"), fg=colors["white"], bg=colors["primary"])
+    header_label.pack(pady=20)
+
+    # — Content area —
+    content_frame = Frame(content_container, bg=colors["white"])
+    content_frame.pack(fill=BOTH, expand=True, padx=40, pady=30)
+
+    # Create a frame for the initial options
+    options_frame = Frame(content_frame, bg=colors["white"])
+    options_frame.pack(fill=BOTH, expand=True)
+
+    # Create a frame for the main RFID scanning functionality
+    scanning_frame = Frame(content_frame, bg=colors["white"])
+
+    # Status with modern font
+    status_lbl = Label(scanning_frame, text="Ready to Scan", 
+                      font=("Helvetica", 36, "bold"), 
+                      fg=colors["text"], bg=colors["white"])
+    status_lbl.pack(pady=(0, 20))
+
+    # Canvas for the image with proper background color
+    image_canvas = Canvas(scanning_frame, width=IMG_SIZE + 40, height=IMG_SIZE + 40,
+                        bg=colors["white"], highlightthickness=0)
+    image_canvas.pack()
+
+    # Clear space for name label
+    spacer = Frame(scanning_frame, height=10, bg=colors["white"])
+    spacer.pack()
+
+    # Name display with nicer font
+    name_frame = Frame(scanning_frame, bg=colors["white"])
+    name_frame.pack(fill=X, pady=10)
+
+    name_lbl = Label(name_frame, text="", 
+                    font=("Helvetica", 28, "bold"), 
+                    fg=colors["primary"], bg=colors["white"])
+    name_lbl.pack(fill=X)
+
+    # Add a footer with additional info
+    footer_lbl = Label(scanning_frame, text="Please place your card on the reader", 
+                      font=("Helvetica", 14), 
+                      fg=colors["secondary"], bg=colors["white"])
+    footer_lbl.pack(pady=(10, 20))
+
+    # Add back button for scanning frame
+    back_btn_frame = Frame(scanning_frame, bg=colors["white"])
+    back_btn_frame.pack(fill=X, pady=10)
+
+    back_btn = Button(back_btn_frame, text="Back to Main Menu", 
+                     font=("Helvetica", 12),
+                     bg=colors["primary"], fg=colors["white"],
+                     command=lambda: [stop_animation(), show_main_options()])
+    back_btn.pack(pady=5)
+
+    # Canvas items for the idle and result screens
+    scan_scene = ScanScene(image_canvas)
 
 # — Helper Functions —
 def create_circular_image(img_path):
     """Create a circular image with proper transparency handling"""
+    from PIL import Image
+    import avatars
+    
+    # Use the display image pre-rendered at registration time when it is up to date
+    display_path = avatars.fresh_derivative(img_path, "display")
+    if display_path and IMG_SIZE == avatars.DISPLAY_SIZE:
+        try:
+            return Image.open(display_path).convert("RGBA")
+        except Exception as e:
+            print(f"Error loading display image: {e}")
+
     try:
         # Load image and convert to RGBA to ensure transparency support
         img = Image.open(img_path).convert("RGBA")
@@ -196,129 +257,194 @@ def create_circular_image(img_path):
         print(f"Error loading image: {e}")
         # Create fallback image if file not found
         img = Image.new("RGBA", (IMG_SIZE, IMG_SIZE), (200, 200, 200, 255))
+
+    return avatars.render_circular(img, IMG_SIZE)
+
+# Custom class for caching rendered avatars
+class AvatarCache:
+    """LRU cache of finished circular avatars (PhotoImage) per card ID
+
+    Entries remember the image file's mtime and size, so a replaced photo is
+    rendered again even if nobody invalidated the card.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # card_id -> (stamp, photo, cost)
+        self.used = 0
+
+    def get(self, card_id, img_path):
+        """Return the rendered avatar for a card, rendering it only on a miss"""
+        try:
+            st = os.stat(img_path)
+            stamp = (img_path, st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = (img_path, None, None)
+
+        entry = self.entries.get(card_id)
+        if entry is not None and entry[0] == stamp:
+            self.entries.move_to_end(card_id)
+            return entry[1]
+
+        from PIL import ImageTk
+        photo = ImageTk.PhotoImage(create_circular_image(img_path))
+        cost = photo.width() * photo.height() * 4
+        self.invalidate(card_id)
+        self.entries[card_id] = (stamp, photo, cost)
+        self.used += cost
+
+        # Evict least recently used avatars over the memory cap
+        while self.used > self.max_bytes and len(self.entries) > 1:
+            _, (_, _, old_cost) = self.entries.popitem(last=False)
+            self.used -= old_cost
+        return photo
+
+    def invalidate(self, card_id):
+        entry = self.entries.pop(card_id, None)
+        if entry is not None:
+            self.used -= entry[2]
+
+avatar_cache = AvatarCache(AVATAR_CACHE_BYTES)
+
+# Denied result, pre-rendered once since unknown cards are the most frequent event
+denied_photo = None
+
+def prepare_denied_image():
+    """Render the denied image, border, badge and glyph into a single image"""
+    global denied_photo
+    from PIL import ImageTk
+    import avatars
+    composite = avatars.render_denied_composite(create_circular_image(DENIED_IMAGE_PATH),
+                                                IMG_SIZE, colors["error"])
+    denied_photo = ImageTk.PhotoImage(composite)
+
+# Custom class for the scan result canvas
+class ScanScene:
+    """Canvas items for the idle, granted and denied screens, created once
+
+    Changing screens only reconfigures items (image, visibility), so every
+    switch is a handful of Tk calls and no item IDs pile up over time.
+    """
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.photo = None  # Keep reference to prevent garbage collection
+        center = IMG_SIZE//2 + 20
+        
+        # Idle: waiting circle with subtle gray fill and the RFID label
+        self.waiting_circle = canvas.create_oval(20, 20, IMG_SIZE+20, IMG_SIZE+20, 
+                                                 outline=colors["primary"], width=3,
+                                                 fill="#f8f8fa", tags=("idle",))
+        canvas.create_text(center, center, text="RFID", font=("Helvetica", 36, "bold"),
+                           fill=colors["secondary"], tags=("idle",))
+        
+        # Result image: the user's avatar or the pre-rendered denied composite
+        self.image = canvas.create_image(center, center, state=HIDDEN)
+        
+        # Granted: success border and checkmark badge, drawn over the image
+        check_x, check_y = IMG_SIZE-40, 40
+        canvas.create_oval(10, 10, IMG_SIZE+30, IMG_SIZE+30, 
+                           outline=colors["success"], width=5, state=HIDDEN, tags=("granted",))
+        canvas.create_oval(check_x-15, check_y-15, check_x+15, check_y+15,
+                           fill=colors["success"], outline="", state=HIDDEN, tags=("granted",))
+        canvas.create_text(check_x, check_y, text="✓", 
+                           fill="white", font=("Helvetica", 20, "bold"), state=HIDDEN, tags=("granted",))
+    
+    def show_idle(self):
+        self.canvas.itemconfigure("granted", state=HIDDEN)
+        self.canvas.itemconfigure(self.image, state=HIDDEN)
+        self.canvas.itemconfigure("idle", state=NORMAL)
+    
+    def show_granted(self, photo):
+        self._show_image(photo)
+        self.canvas.itemconfigure("granted", state=NORMAL)
+    
+    def show_denied(self, photo):
+        self._show_image(photo)
+        self.canvas.itemconfigure("granted", state=HIDDEN)
+    
+    def _show_image(self, photo):
+        self.photo = photo
+        self.canvas.itemconfigure("idle", state=HIDDEN)
+        self.canvas.itemconfigure(self.image, image=photo, state=NORMAL)
+
+def fade_in_text(label, text, color, screen):
+    """Animate text appearance, replacing any text animation already running on the label"""
+    label.config(text="", fg=color)
     
-    # Resize image
-    img = img.resize((IMG_SIZE, IMG_SIZE))
-    
-    # Create circular mask
-    mask = Image.new("L", (IMG_SIZE, IMG_SIZE), 0)
-    draw = ImageDraw.Draw(mask)
-    draw.ellipse((0, 0, IMG_SIZE, IMG_SIZE), fill=255)
-    
-    # Create new transparent image
-    result = Image.new("RGBA", (IMG_SIZE, IMG_SIZE), (0, 0, 0, 0))
-    
-    # Paste original image using mask
-    result.paste(img, (0, 0), mask)
+    def step(t):
+        shown = min(len(text), int(t / TEXT_FADE_TIME) + 1)
+        label.config(text=text[:shown])
+        return shown < len(text)
     
-    return result
-
-def fade_in_text(label, text, color, i=0):
-    """Animate text appearance"""
-    if i <= len(text):
-        label.config(text=text[:i], fg=color)
-        root.after(40, fade_in_text, label, text, color, i + 1)
+    animations.start(f"text {label}", step, screen, fps=1 / TEXT_FADE_TIME)
 
-def pulse_effect(canvas, item, size=0, increasing=True, max_size=10):
+def pulse_effect(canvas, item, max_size=10):
     """Create a pulsing animation effect for the waiting circle"""
-    if not hasattr(pulse_effect, "active") or not pulse_effect.active:
-        return
+    def step(t):
+        phase = (t % PULSE_PERIOD) / PULSE_PERIOD
+        size = max_size * (1 - abs(1 - 2 * phase))  # 0 -> max_size -> 0
         
-    if increasing:
-        size += 0.5
-        if size >= max_size:
-            increasing = False
-    else:
-        size -= 0.5
-        if size <= 0:
-            increasing = True
-            
-    # Update the oval size
-    canvas.coords(item, 
-                20-size, 20-size, 
-                IMG_SIZE+20+size, IMG_SIZE+20+size)
+        # Update the oval size
+        canvas.coords(item, 
+                    20-size, 20-size, 
+                    IMG_SIZE+20+size, IMG_SIZE+20+size)
+        return True
     
-    # Continue animation
-    root.after(50, pulse_effect, canvas, item, size, increasing)
+    animations.start("pulse", step, "idle", fps=PULSE_FPS)
 
 def start_waiting_animation():
     """Create the waiting for card animation"""
-    image_canvas.delete("all")
-    
-    # Draw waiting circle with subtle gray fill
-    waiting_circle = image_canvas.create_oval(20, 20, IMG_SIZE+20, IMG_SIZE+20, 
-                                           outline=colors["primary"], width=3,
-                                           fill="#f8f8fa")
-    
-    # Add RFID icon or text in the middle
-    image_canvas.create_text(IMG_SIZE//2 + 20, IMG_SIZE//2 + 20,
-                          text="RFID", font=("Helvetica", 36, "bold"),
-                          fill=colors["secondary"])
+    scan_scene.show_idle()
     
     # Start pulsing animation
-    pulse_effect.active = True
-    pulse_effect(image_canvas, waiting_circle)
+    animations.show("idle")
+    pulse_effect(image_canvas, scan_scene.waiting_circle)
     
     # Update labels
-    fade_in_text(status_lbl, "Ready to Scan", colors["text"])
+    fade_in_text(status_lbl, "Ready to Scan", colors["text"], "idle")
     name_lbl.config(text="")  # Clear the name label
     footer_lbl.config(text="Please place your card on the reader")
 
+# Pending return to the idle screen after a scan result
+reset_job = None
+
 def stop_animation():
-    """Stop any ongoing animations"""
-    pulse_effect.active = False
+    """Stop any ongoing animations and the pending return to the idle screen"""
+    global reset_job
+    animations.show(None)
+    if reset_job is not None:
+        root.after_cancel(reset_job)
+        reset_job = None
 
 def show_idle_screen():
     """Reset UI to waiting state"""
-    global last_read_uid
     name_lbl.config(text="")
     stop_animation()
     start_waiting_animation()
-    # Reset the last read UID so cards can be scanned again
-    last_read_uid = None
 
 def show_user(uid):
     """Display user access result"""
-    stop_animation()
-    uid = uid.strip().upper()
+    global reset_job
+    stop_animation()  # Also drops a previous scan's reset, so this result gets its full RESET_TIME
+    uid = normalize_uid(uid)
     user = USERS.get(uid)
-    image_canvas.delete("all")
-    
-    # Log this access attempt
-    status = "ACCESS GRANTED" if user else "ACCESS DENIED"
-    user_name = user["name"] if user else "Unknown User"
-    log_access(uid, user_name, status)
+    render_start = time.perf_counter()
     
     if user:
         # === ACCESS GRANTED ===
         try:
-            # Create circular image
-            circular_img = create_circular_image(user["image"])
-            photo = ImageTk.PhotoImage(circular_img)
-            image_canvas.user_image = photo  # Keep reference to prevent garbage collection
-            
-            # Draw a success border (green circle)
-            image_canvas.create_oval(10, 10, IMG_SIZE+30, IMG_SIZE+30, 
-                                  outline=colors["success"], width=5)
+            # Circular image, rendered once per card and photo
+            photo = avatar_cache.get(uid, user["image"])
+            metrics.observe("image_load", time.perf_counter() - render_start)
+            render_start = time.perf_counter()
             
-            # Draw image
-            image_canvas.create_image(IMG_SIZE//2 + 20, IMG_SIZE//2 + 20, 
-                                   image=photo)
-            
-            # Create success checkmark icon with animation
-            check_x, check_y = IMG_SIZE-40, 40
-            image_canvas.create_oval(check_x-15, check_y-15, check_x+15, check_y+15,
-                                  fill=colors["success"], outline="")
-            image_canvas.create_text(check_x, check_y, text="✓", 
-                                  fill="white", font=("Helvetica", 20, "bold"))
+            # Image with the success border and checkmark badge
+            scan_scene.show_granted(photo)
             
             # Update text with animation
-            fade_in_text(status_lbl, "✅ Allowed", colors["success"])
+            fade_in_text(status_lbl, "✅ Allowed", colors["success"], "result")
             
             # Set name directly with no animation
-            name = user["name"]
-            print(f"Setting name to: {name}")  # Debug print
-            name_lbl.config(text=name)
+            name_lbl.config(text=user["name"])
             
             # Make name visible and update footer
             footer_lbl.config(text="Welcome! You may proceed.")
@@ -330,28 +456,15 @@ def show_user(uid):
     else:
         # === ACCESS DENIED ===
         try:
-            # Create circular image with border for denied access
-            circular_img = create_circular_image(DENIED_IMAGE_PATH)
-            photo = ImageTk.PhotoImage(circular_img)
-            image_canvas.denied_image = photo  # Keep reference
-            
-            # Draw error border
-            image_canvas.create_oval(10, 10, IMG_SIZE+30, IMG_SIZE+30, 
-                                  outline=colors["error"], width=5)
-            
-            # Draw image
-            image_canvas.create_image(IMG_SIZE//2 + 20, IMG_SIZE//2 + 20, 
-                                   image=photo)
-            
-            # Create error X icon
-            x_pos_x, x_pos_y = IMG_SIZE-40, 40
-            image_canvas.create_oval(x_pos_x-15, x_pos_y-15, x_pos_x+15, x_pos_y+15,
-                                  fill=colors["error"], outline="")
-            image_canvas.create_text(x_pos_x, x_pos_y, text="✕", 
-                                  fill="white", font=("Helvetica", 16, "bold"))
+            # Pre-rendered composite: one canvas image, no image processing per scan
+            if denied_photo is None:
+                prepare_denied_image()
+            metrics.observe("image_load", time.perf_counter() - render_start)
+            render_start = time.perf_counter()
+            scan_scene.show_denied(denied_photo)
             
             # Update text
-            fade_in_text(status_lbl, "❌ Not Allowed", colors["error"])
+            fade_in_text(status_lbl, "❌ Not Allowed", colors["error"], "result")
             name_lbl.config(text="Unknown User")
             footer_lbl.config(text="Sorry, you don't have permission.")
             
@@ -359,36 +472,56 @@ def show_user(uid):
             print(f"Error displaying denied image: {e}")
             name_lbl.config(text=f"Error: {e}")
     
+    # Tk redraws from idle callbacks queued by the changes above; one queued after them
+    # times the render including Tk's own work, without forcing a redraw here
+    root.after_idle(lambda: metrics.observe("canvas_render", time.perf_counter() - render_start))
+    
     # Reset after timeout
-    root.after(RESET_TIME, show_idle_screen)
+    reset_job = root.after(RESET_TIME, show_idle_screen)
 
-def read_loop():
-    """RFID reader thread function"""
-    global last_read_uid
-    last_read_uid = None
-    
-    while True:
-        try:
-            if ser.in_waiting:
-                uid = ser.readline().decode().strip().upper()
-                if uid and uid != last_read_uid:
-                    last_read_uid = uid
-                    print(f"Card read: {uid}")
-                    
-                    # Check if the card is in the USERS dictionary
-                    is_authorized = uid in USERS
-                    
-                    # Send response back to Arduino
-                    if is_authorized:
-                        ser.write(b'1')  # Authorized
-                    else:
-                        ser.write(b'0')  # Not authorized
-                    
-                    # Process the card in the UI
-                    root.after(0, process_card_read, uid)
-        except Exception as e:
-            print(f"Serial read error: {e}")
-        time.sleep(0.1)
+def poll_engine_events():
+    """Pick up card reads and errors sent by the access engine process"""
+    for event in engine.poll_events():
+        kind = event[0]
+        if kind == "card":
+            # The engine has already answered the Arduino, this updates the UI. The scan is
+            # logged when its cooldown window closes, with the repeats folded into it.
+            _, door, uid, is_authorized, received, timings = event
+            metrics.observe_many(timings)
+            metrics.count_scan(door, is_authorized)
+            if not attached:
+                user = USERS.get(uid)
+                user_name = user["name"] if user else "Unknown User"
+                scan_log.opened(door, uid, user_name, is_authorized)
+            process_card_read(uid)
+        elif kind == "card_done":
+            _, door, uid, repeats = event
+            if not attached:
+                scan_log.closed(door, uid, repeats)
+        elif kind == "suppressed":
+            _, door, count, cards = event
+            metrics.count_suppressed(door, count)
+            if not attached:
+                scan_log.suppressed(door, count, cards)
+        elif kind == "connected":
+            print(f"Door {event[1]}: connected to {event[2]}")
+            metrics.mark_startup("first_serviceable_scan", time.perf_counter() - LAUNCH_TIME)
+        elif kind == "connect_error":
+            _, door, port, error = event
+            print(f"Serial connection error at {door}: {error}")
+            messagebox.showerror("Connection Error", f"Failed to connect to RFID reader for door {door} at {port}.\n\nError: {error}")
+        elif kind == "error":
+            print(f"Serial read error at {event[1]}: {event[2]}")
+
+    root.after(EVENT_POLL_TIME, poll_engine_events)
+
+def write_metrics():
+    """Write the metrics file for the node exporter every METRICS_INTERVAL"""
+    try:
+        metrics.write_prometheus(METRICS_FILE)
+    except Exception as e:
+        print(f"Error writing metrics: {e}")
+    root.after(METRICS_INTERVAL, write_metrics)
 
 def process_card_read(uid):
     """Process a card read based on current application state"""
@@ -612,14 +745,31 @@ def admin_panel():
     users_tab = Frame(notebook, bg=colors["white"])
     notebook.add(users_tab, text="User Management")
     
-    # Setup Register User tab
-    setup_register_tab(register_tab)
+    # Statistics tab
+    stats_tab = Frame(notebook, bg=colors["white"])
+    notebook.add(stats_tab, text="Statistics")
+    
+    # Analytics tab
+    analytics_tab = Frame(notebook, bg=colors["white"])
+    notebook.add(analytics_tab, text="Analytics")
+    
+    # Each tab is built, and loads its data, the first time it is selected
+    builders = {
+        str(register_tab): setup_register_tab,
+        str(logs_tab): setup_logs_tab,
+        str(users_tab): setup_users_tab,
+        str(stats_tab): setup_stats_tab,
+        str(analytics_tab): setup_analytics_tab,
+    }
     
-    # Setup Logs tab
-    setup_logs_tab(logs_tab)
+    def build_selected_tab(event=None):
+        tab = notebook.select()
+        builder = builders.pop(tab, None)
+        if builder is not None:
+            builder(notebook.nametowidget(tab))
     
-    # Setup Users Management tab
-    setup_users_tab(users_tab)
+    notebook.bind("<<NotebookTabChanged>>", build_selected_tab)
+    build_selected_tab()
     
     # Create a global back button at the bottom of the main window
     global main_back_btn_frame
@@ -716,9 +866,11 @@ def setup_register_tab(parent):
             widget.destroy()
             
         try:
-            # Load and resize image for preview
-            img = Image.open(img_path)
-            img = img.resize((100, 100), Image.LANCZOS)
+            from PIL import ImageTk
+            import avatars
+            
+            # Load the preview thumbnail (resized on the fly if there is none yet)
+            img = avatars.load_thumbnail(img_path)
             photo = ImageTk.PhotoImage(img)
             
             # Display image
@@ -732,6 +884,7 @@ def setup_register_tab(parent):
     
     # Browse button with adjusted width and padding
     def browse_image():
+        from tkinter import filedialog
         file_path = filedialog.askopenfilename(
             title="Select Image",
             filetypes=[("Image files", "*.jpg *.jpeg *.png")]
@@ -755,7 +908,7 @@ def setup_register_tab(parent):
     
     # Register button
     def save_user():
-        card_id = card_var.get().strip().upper()
+        card_id = normalize_uid(card_var.get())
         name = name_var.get().strip()
         image_path = image_path_var.get().strip()
         
@@ -773,20 +926,24 @@ def setup_register_tab(parent):
         
         # Copy image to user_images directory with a unique name
         try:
+            import shutil
+            import avatars
+            
             extension = os.path.splitext(image_path)[1]
             new_image_name = f"{card_id}{extension}"
             new_image_path = os.path.join(IMAGES_DIR, new_image_name)
             
             shutil.copy2(image_path, new_image_path)
             
-            # Add user to database
-            USERS[card_id] = {
+            # Pre-render the display image and preview thumbnail
+            avatars.make_derivatives(new_image_path)
+            
+            # Add user to the user store
+            avatar_cache.invalidate(card_id)
+            user_table.put(card_id, {
                 "name": name,
                 "image": new_image_path
-            }
-            
-            # Save to file
-            save_users(USERS)
+            })
             
             # Reset form
             card_var.set("")
@@ -842,12 +999,20 @@ def setup_logs_tab(parent):
                     fg=colors["primary"], bg=colors["white"])
     title_lbl.pack(pady=10)
     
+    # Search: card ID prefix or name, status and date range, answered from the store's indexes
+    search_frame = Frame(logs_frame, bg=colors["white"])
+    search_frame.pack(fill=X, pady=(0, 5))
+    
+    # Page navigation: only one page of events lives in the treeview at a time
+    nav_frame = Frame(logs_frame, bg=colors["white"])
+    nav_frame.pack(fill=X)
+    
     # Create a container frame for the treeview and scrollbars
     tree_frame = Frame(logs_frame, bg=colors["white"])
     tree_frame.pack(fill=BOTH, expand=True, pady=10)
     
     # Treeview for logs
-    columns = ("timestamp", "card_id", "name", "status")
+    columns = ("timestamp", "card_id", "name", "status", "door", "repeats")
     tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
     
     # Configure column widths
@@ -855,12 +1020,16 @@ def setup_logs_tab(parent):
     tree.column("card_id", width=100, anchor="center")
     tree.column("name", width=150, anchor="center")
     tree.column("status", width=100, anchor="center")
+    tree.column("door", width=80, anchor="center")
+    tree.column("repeats", width=70, anchor="center")
     
     # Set column headings
     tree.heading("timestamp", text="Timestamp")
     tree.heading("card_id", text="Card ID")
     tree.heading("name", text="Name")
     tree.heading("status", text="Status")
+    tree.heading("door", text="Door")
+    tree.heading("repeats", text="Repeats")
     
     # Add scrollbars
     vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
@@ -872,25 +1041,227 @@ def setup_logs_tab(parent):
     hsb.pack(side=BOTTOM, fill=X)
     tree.pack(side=LEFT, fill=BOTH, expand=True)
     
+    # Window state: events on the current page, whether it follows the newest
+    # events, the active search (None when browsing) and the one pending refresh timer
+    page_rows = []
+    following = True
+    search_args = None
+    refresh_job = None
+    page_size_var = StringVar(value=str(LOGS_PAGE_SIZE))
+    search_text_var, search_from_var, search_to_var = StringVar(), StringVar(), StringVar()
+    search_status_var = StringVar(value="All")
+    jump_var = StringVar()
+    page_info_var = StringVar()
+
+    def page_size():
+        try:
+            return int(page_size_var.get())
+        except ValueError:
+            return LOGS_PAGE_SIZE
+
+    def show_page(rows, follow):
+        """Replace the treeview contents with one page of events"""
+        nonlocal page_rows, following
+        page_rows = rows
+        following = follow
+        tree.delete(*tree.get_children())
+        for event in rows:
+            tree.insert("", "end", iid=event[0], values=event[1:])
+        if rows:
+            page_info_var.set(f"{rows[0][1]}  to  {rows[-1][1]}" + ("  (live)" if follow else ""))
+        else:
+            page_info_var.set("No matching log entries" if search_args is not None else "No log entries")
+
+    # Pages come from the search while one is active, from the whole log otherwise
+    def rows_before(before_id):
+        if search_args is not None:
+            return event_store.search(**search_args, before_id=before_id, limit=page_size())
+        return event_store.events_before(before_id, page_size())
+
+    def rows_after(after_id):
+        if search_args is not None:
+            return event_store.search(**search_args, after_id=after_id, limit=page_size())
+        return event_store.events_after(after_id, page_size())
+
+    def last_page():
+        show_page(rows_before(None), search_args is None)
+        tree.yview_moveto(1.0)
+
+    def first_page():
+        show_page(rows_after(0), False)
+        if len(page_rows) < page_size():
+            last_page()
+
+    def next_page():
+        if not page_rows or following:
+            return last_page()
+        rows = rows_after(page_rows[-1][0])
+        if len(rows) < page_size():
+            return last_page()
+        show_page(rows, False)
+        tree.yview_moveto(0.0)
+
+    def prev_page():
+        if not page_rows:
+            return
+        rows = rows_before(page_rows[0][0])
+        if rows:
+            show_page(rows, False)
+            tree.yview_moveto(1.0)
+
+    def jump_to_date():
+        """Show the page starting at the first event on or after the entered date"""
+        timestamp = parse_timestamp(jump_var.get())
+        if timestamp is None:
+            messagebox.showwarning("Invalid Date", "Please enter a date as YYYY-MM-DD [HH:MM[:SS]]")
+            return
+        first_id = event_store.first_id_at(timestamp)
+        if first_id is None:
+            return last_page()
+        rows = rows_after(first_id - 1)
+        if len(rows) < page_size():
+            return last_page()
+        show_page(rows, False)
+        tree.yview_moveto(0.0)
+
+    def change_page_size(event=None):
+        """Reload the current position with the new page size"""
+        if following or not page_rows:
+            return last_page()
+        rows = rows_after(page_rows[0][0] - 1)
+        if len(rows) < page_size():
+            return last_page()
+        show_page(rows, False)
+
+    def run_search(event=None):
+        """Show the newest events matching the search fields"""
+        nonlocal search_args
+        start = end = None
+        if search_from_var.get().strip():
+            start = parse_timestamp(search_from_var.get())
+        if search_to_var.get().strip():
+            end = parse_timestamp(search_to_var.get(), end_of_day=True)
+        if (search_from_var.get().strip() and start is None) or (search_to_var.get().strip() and end is None):
+            messagebox.showwarning("Invalid Date", "Please enter dates as YYYY-MM-DD [HH:MM[:SS]]")
+            return
+        text = search_text_var.get().strip() or None
+        if text and event_store.fts and len(text) < SEARCH_MIN_TRIGRAM and not all(c in string.hexdigits for c in text):
+            messagebox.showwarning("Search Too Short",
+                                   f"Please enter at least {SEARCH_MIN_TRIGRAM} characters of a name, or a card ID prefix")
+            return
+        status = None if search_status_var.get() == "All" else search_status_var.get()
+        if text is None and status is None and start is None and end is None:
+            return clear_search()
+
+        search_args = {"text": text, "status": status, "start": start, "end": end}
+        search_start = time.perf_counter()
+        try:
+            last_page()
+        except Exception as e:
+            print(f"Error searching logs: {e}")
+            return
+        if page_rows:
+            page_info_var.set(page_info_var.get() + f"  ({(time.perf_counter() - search_start) * 1000:.0f} ms)")
+
+    def clear_search():
+        nonlocal search_args
+        search_args = None
+        for var in (search_text_var, search_from_var, search_to_var):
+            var.set("")
+        search_status_var.set("All")
+        last_page()
+
+    # Fetch the neighbouring page when scrolling past either end of the current one
+    def on_mousewheel(event):
+        down = event.num == 5 or event.delta < 0
+        first, last = tree.yview()
+        if down and last >= 1.0 and not following:
+            next_page()
+        elif not down and first <= 0.0:
+            prev_page()
+
+    tree.bind("<MouseWheel>", on_mousewheel)
+    tree.bind("<Button-4>", on_mousewheel)
+    tree.bind("<Button-5>", on_mousewheel)
+
     # Load logs
     def load_logs():
-        # Clear existing items
-        for item in tree.get_children():
-            tree.delete(item)
-        
-        # Load logs from file
-        if os.path.exists(LOGS_FILE):
-            try:
-                with open(LOGS_FILE, "r") as f:
-                    reader = csv.reader(f)
-                    next(reader)  # Skip header
-                    for i, row in enumerate(reader):
-                        tree.insert("", "end", iid=i, values=row)
-            except Exception as e:
-                print(f"Error loading logs: {e}")
-        
-        # Schedule to refresh every 5 seconds
-        parent.after(5000, load_logs)
+        """Refresh the live page when new events were logged"""
+        nonlocal refresh_job
+        if refresh_job is not None:
+            parent.after_cancel(refresh_job)
+            refresh_job = None
+
+        try:
+            if following and (not page_rows or event_store.last_id() != page_rows[-1][0]):
+                last_page()
+        except Exception as e:
+            print(f"Error loading logs: {e}")
+
+        # Refresh every few seconds
+        refresh_job = parent.after(LOGS_REFRESH_TIME, load_logs)
+
+    def reload_logs():
+        """Go back to the newest events"""
+        last_page()
+        load_logs()
+
+    def stop_refresh(event):
+        """Cancel the refresh timer when the admin panel closes"""
+        nonlocal refresh_job
+        if refresh_job is not None:
+            parent.after_cancel(refresh_job)
+            refresh_job = None
+
+    logs_frame.bind("<Destroy>", stop_refresh)
+
+    # Navigation controls
+    nav_style = {
+        "font": ("Helvetica", 10),
+        "bg": colors["secondary"],
+        "fg": colors["white"],
+        "width": 3
+    }
+    Button(nav_frame, text="⏮", command=first_page, **nav_style).pack(side=LEFT, padx=2)
+    Button(nav_frame, text="◀", command=prev_page, **nav_style).pack(side=LEFT, padx=2)
+    Button(nav_frame, text="▶", command=next_page, **nav_style).pack(side=LEFT, padx=2)
+    Button(nav_frame, text="⏭", command=reload_logs, **nav_style).pack(side=LEFT, padx=2)
+
+    page_size_box = ttk.Combobox(nav_frame, textvariable=page_size_var, width=5, state="readonly",
+                                 values=[str(size) for size in LOGS_PAGE_SIZES])
+    page_size_box.pack(side=LEFT, padx=5)
+    page_size_box.bind("<<ComboboxSelected>>", change_page_size)
+
+    jump_entry = Entry(nav_frame, textvariable=jump_var, font=("Helvetica", 10), width=12)
+    jump_entry.pack(side=LEFT, padx=5)
+    jump_entry.bind("<Return>", lambda event: jump_to_date())
+    Button(nav_frame, text="Go to date", font=("Helvetica", 10),
+           bg=colors["primary"], fg=colors["white"],
+           command=jump_to_date).pack(side=LEFT, padx=2)
+
+    page_info_lbl = Label(nav_frame, textvariable=page_info_var,
+                          font=("Helvetica", 10),
+                          fg=colors["secondary"], bg=colors["white"])
+    page_info_lbl.pack(side=LEFT, padx=5)
+    
+    # Search controls
+    for label, var, width in (("Card ID or name:", search_text_var, 18), ("From:", search_from_var, 11),
+                              ("To:", search_to_var, 11)):
+        Label(search_frame, text=label, font=("Helvetica", 10),
+              fg=colors["text"], bg=colors["white"]).pack(side=LEFT, padx=(5, 2))
+        search_entry = Entry(search_frame, textvariable=var, font=("Helvetica", 10), width=width)
+        search_entry.pack(side=LEFT, padx=2)
+        search_entry.bind("<Return>", run_search)
+    search_status_box = ttk.Combobox(search_frame, textvariable=search_status_var, state="readonly", width=16,
+                                     values=("All", "ACCESS GRANTED", "ACCESS DENIED", "RATE LIMITED"))
+    search_status_box.pack(side=LEFT, padx=5)
+    search_status_box.bind("<<ComboboxSelected>>", run_search)
+    Button(search_frame, text="Search", font=("Helvetica", 10),
+           bg=colors["primary"], fg=colors["white"],
+           command=run_search).pack(side=LEFT, padx=2)
+    Button(search_frame, text="Clear", font=("Helvetica", 10),
+           bg=colors["secondary"], fg=colors["white"],
+           command=clear_search).pack(side=LEFT, padx=2)
     
     # Button frame - now using pack instead of grid
     btn_frame = Frame(logs_frame, bg=colors["white"])
@@ -900,40 +1271,29 @@ def setup_logs_tab(parent):
     refresh_btn = Button(btn_frame, text="Refresh", 
                       font=("Helvetica", 10),
                       bg=colors["primary"], fg=colors["white"],
-                      command=load_logs)
+                      command=reload_logs)
     refresh_btn.pack(side=LEFT, padx=5)
     
     # Export button
-    def export_logs():
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-            title="Export Logs"
-        )
-        if file_path:
-            try:
-                shutil.copy2(LOGS_FILE, file_path)
-                messagebox.showinfo("Export Successful", f"Logs exported to {file_path}")
-            except Exception as e:
-                messagebox.showerror("Export Failed", f"Error exporting logs: {e}")
-    
-    export_btn = Button(btn_frame, text="Export to CSV", 
+    export_btn = Button(btn_frame, text="Export...", 
                       font=("Helvetica", 10),
                       bg=colors["secondary"], fg=colors["white"],
-                      command=export_logs)
+                      command=open_export_dialog)
     export_btn.pack(side=LEFT, padx=5)
     
     # Clear logs button
     def clear_logs():
         if messagebox.askyesno("Clear Logs", "Are you sure you want to clear all logs?"):
             try:
-                # Create new logs file with just the header
-                with open(LOGS_FILE, "w", newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(["Timestamp", "Card ID", "Name", "Status"])
+                # Write out pending rows first so they are cleared too
+                log_writer.flush()
+
+                # Drop the rotated segments and start a new logs file with just the header
+                log_archive.clear()
+                event_store.clear()
                 
                 # Refresh display
-                load_logs()
+                reload_logs()
                 messagebox.showinfo("Logs Cleared", "All logs have been cleared.")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to clear logs: {e}")
@@ -943,9 +1303,150 @@ def setup_logs_tab(parent):
                      bg=colors["error"], fg=colors["white"],
                      command=clear_logs)
     clear_btn.pack(side=LEFT, padx=5)
+    if attached:
+        # The daemon owns the log writer and archive, clearing them from here would
+        # leave it rotating segments that no longer exist
+        clear_btn.config(state=DISABLED)
     
     # Load logs initially
-    load_logs()
+    reload_logs()
+
+def parse_timestamp(text, end_of_day=False):
+    """Log timestamp from YYYY-MM-DD [HH:MM[:SS]], None if the text is not a date"""
+    text = text.strip()
+    for fmt in (TIMESTAMP_FORMAT, "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            moment = datetime.datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if end_of_day and fmt == "%Y-%m-%d":
+            moment = moment.replace(hour=23, minute=59, second=59)
+        return moment.strftime(TIMESTAMP_FORMAT)
+    return None
+
+def open_export_dialog():
+    """Export dialog: filter the log and stream the matches to CSV from a worker thread"""
+    export_window = Toplevel(root)
+    export_window.title("Export Logs")
+    export_window.configure(bg=colors["bg"])
+    export_window.resizable(False, False)
+    export_window.transient(root)
+    export_window.grab_set()
+    
+    export_frame = Frame(export_window, bg=colors["white"], padx=30, pady=20)
+    export_frame.pack(fill=BOTH, expand=True, padx=20, pady=20)
+    
+    title_lbl = Label(export_frame, text="Export Logs", 
+                    font=("Helvetica", 18, "bold"), 
+                    fg=colors["primary"], bg=colors["white"])
+    title_lbl.grid(row=0, column=0, columnspan=2, pady=(0, 15))
+    
+    # Filter fields
+    from_var, to_var, text_var = StringVar(), StringVar(), StringVar()
+    status_var = StringVar(value="All")
+    fields = (("From (YYYY-MM-DD):", from_var), ("To (YYYY-MM-DD):", to_var), ("Card ID or name:", text_var))
+    for row, (label, var) in enumerate(fields, start=1):
+        Label(export_frame, text=label, font=("Helvetica", 12), 
+              fg=colors["text"], bg=colors["white"], anchor="w").grid(row=row, column=0, sticky="w", pady=5)
+        Entry(export_frame, font=("Helvetica", 12), width=22, textvariable=var).grid(row=row, column=1, pady=5)
+    
+    Label(export_frame, text="Status:", font=("Helvetica", 12), 
+          fg=colors["text"], bg=colors["white"], anchor="w").grid(row=4, column=0, sticky="w", pady=5)
+    status_box = ttk.Combobox(export_frame, textvariable=status_var, state="readonly", width=20,
+                              values=("All", "ACCESS GRANTED", "ACCESS DENIED", "RATE LIMITED"))
+    status_box.grid(row=4, column=1, pady=5)
+    
+    # Progress
+    progress_bar = ttk.Progressbar(export_frame, length=320, mode="determinate")
+    progress_bar.grid(row=5, column=0, columnspan=2, pady=(15, 5))
+    progress_var = StringVar(value="")
+    Label(export_frame, textvariable=progress_var, font=("Helvetica", 10), 
+          fg=colors["text"], bg=colors["white"]).grid(row=6, column=0, columnspan=2)
+    
+    btn_frame = Frame(export_frame, bg=colors["white"])
+    btn_frame.grid(row=7, column=0, columnspan=2, pady=(15, 0))
+    
+    # Shared with the worker thread, which only ever writes to it
+    job = {"thread": None, "cancel": threading.Event(), "scanned": 0, "written": 0,
+           "total": 0, "result": None, "error": None, "path": None}
+    
+    def worker(file_path, start, end, match):
+        try:
+            log_writer.flush()  # Include rows still waiting in the writer
+            job["total"] = log_archive.count_rows(start, end)
+            def progress(scanned, written):
+                job["scanned"], job["written"] = scanned, written
+            job["result"] = export_rows(file_path, log_archive.rows(start, end), match,
+                                        progress, job["cancel"])
+        except Exception as e:
+            job["error"] = e
+    
+    def watch_export():
+        """Show the worker's progress until it finishes"""
+        if job["total"]:
+            progress_bar["value"] = min(100, job["scanned"] * 100 / job["total"])
+        progress_var.set(f"{job['scanned']} rows scanned, {job['written']} exported")
+        if job["thread"].is_alive():
+            export_window.after(100, watch_export)
+            return
+        
+        job["thread"] = None
+        if job["error"] is not None:
+            messagebox.showerror("Export Failed", f"Error exporting logs: {job['error']}", parent=export_window)
+        elif job["result"] is None:
+            progress_var.set("Export cancelled")
+        else:
+            progress_bar["value"] = 100
+            messagebox.showinfo("Export Successful", 
+                               f"{job['result']} log entries exported to {job['path']}", parent=export_window)
+        export_window.destroy()
+    
+    def start_export():
+        start = end = None
+        if from_var.get().strip():
+            start = parse_timestamp(from_var.get())
+        if to_var.get().strip():
+            end = parse_timestamp(to_var.get(), end_of_day=True)
+        if (from_var.get().strip() and start is None) or (to_var.get().strip() and end is None):
+            messagebox.showwarning("Invalid Date", "Please enter dates as YYYY-MM-DD [HH:MM[:SS]]", parent=export_window)
+            return
+        status = None if status_var.get() == "All" else status_var.get()
+        
+        from tkinter import filedialog
+        file_path = filedialog.asksaveasfilename(
+            parent=export_window,
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("Gzipped CSV files", "*.csv.gz"), ("All files", "*.*")],
+            title="Export Logs"
+        )
+        if not file_path:
+            return
+        
+        job["path"] = file_path
+        job["thread"] = threading.Thread(target=worker, args=(file_path, start, end, row_filter(text_var.get(), status)),
+                                         daemon=True)
+        job["thread"].start()
+        export_btn.config(state=DISABLED)
+        watch_export()
+    
+    def cancel_export():
+        if job["thread"] is not None:
+            job["cancel"].set()  # The worker stops at its next progress check and removes the partial file
+        else:
+            export_window.destroy()
+    
+    export_btn = Button(btn_frame, text="Export", 
+                      font=("Helvetica", 10),
+                      bg=colors["secondary"], fg=colors["white"],
+                      command=start_export)
+    export_btn.pack(side=LEFT, padx=5)
+    
+    cancel_btn = Button(btn_frame, text="Cancel", 
+                      font=("Helvetica", 10),
+                      bg=colors["error"], fg=colors["white"],
+                      command=cancel_export)
+    cancel_btn.pack(side=LEFT, padx=5)
+    export_window.protocol("WM_DELETE_WINDOW", cancel_export)
 
 def setup_users_tab(parent):
     """Set up the user management tab"""
@@ -1065,6 +1566,7 @@ def setup_users_tab(parent):
         
         # Browse button with better positioning
         def browse_image():
+            from tkinter import filedialog
             file_path = filedialog.askopenfilename(
                 title="Select Image",
                 filetypes=[("Image files", "*.jpg *.jpeg *.png")]
@@ -1096,8 +1598,13 @@ def setup_users_tab(parent):
                 return
             
             try:
+                updated = dict(user)
+                
                 # Check if new image is selected
                 if image_path != user["image"]:
+                    import shutil
+                    import avatars
+                    
                     # Copy new image to user_images directory
                     extension = os.path.splitext(image_path)[1]
                     new_image_name = f"{card_id}{extension}"
@@ -1105,14 +1612,18 @@ def setup_users_tab(parent):
                     
                     shutil.copy2(image_path, new_image_path)
                     
+                    # Pre-render the display image and preview thumbnail
+                    avatars.make_derivatives(new_image_path)
+                    
                     # Update user image path
-                    USERS[card_id]["image"] = new_image_path
+                    updated["image"] = new_image_path
                 
                 # Update user name
-                USERS[card_id]["name"] = name
+                updated["name"] = name
+                avatar_cache.invalidate(card_id)
                 
-                # Save to file
-                save_users(USERS)
+                # Save to the user store
+                user_table.put(card_id, updated)
                 
                 # Close dialog and refresh list
                 edit_window.destroy()
@@ -1160,11 +1671,9 @@ def setup_users_tab(parent):
         # Confirm deletion
         if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete user {user['name']}?"):
             try:
-                # Remove user from dictionary
-                del USERS[card_id]
-                
-                # Save to file
-                save_users(USERS)
+                # Remove user from the user store
+                user_table.delete(card_id)
+                avatar_cache.invalidate(card_id)
                 
                 # Refresh list
                 load_users_to_tree()
@@ -1203,29 +1712,254 @@ def setup_users_tab(parent):
     
     # Load users initially
     load_users_to_tree()  # THIS LINE WAS MISSING - Call the function to load users when the tab is created
+
+def setup_stats_tab(parent):
+    """Set up the statistics tab"""
+    stats_frame = Frame(parent, bg=colors["white"], padx=20, pady=10)
+    stats_frame.pack(fill=BOTH, expand=True)
+    
+    # Title
+    title_lbl = Label(stats_frame, text="Scan Statistics", 
+                    font=("Helvetica", 14, "bold"), 
+                    fg=colors["primary"], bg=colors["white"])
+    title_lbl.pack(pady=10)
+    
+    # Summary line: rate and decisions
+    summary_var = StringVar()
+    summary_lbl = Label(stats_frame, textvariable=summary_var, 
+                      font=("Helvetica", 12), 
+                      fg=colors["text"], bg=colors["white"])
+    summary_lbl.pack(pady=5)
+    
+    # One row per stage
+    columns = ("stage", "count", "avg", "p95")
+    tree = ttk.Treeview(stats_frame, columns=columns, show="headings", height=len(STAGES))
+    tree.column("stage", width=150, anchor="w")
+    tree.column("count", width=80, anchor="center")
+    tree.column("avg", width=100, anchor="center")
+    tree.column("p95", width=100, anchor="center")
+    tree.heading("stage", text="Stage")
+    tree.heading("count", text="Count")
+    tree.heading("avg", text="Average (ms)")
+    tree.heading("p95", text="p95 (ms)")
+    tree.pack(fill=X, pady=10)
+    for stage, label in STAGES:
+        tree.insert("", "end", iid=stage, values=(label, 0, "-", "-"))
+    
+    refresh_job = None
+    
+    def refresh_stats():
+        nonlocal refresh_job
+        granted, denied = metrics.totals()
+        total = granted + denied
+        ratio = f"{granted / total * 100:.0f}% granted" if total else "no scans yet"
+        startup = "  •  ".join(f"{phase.replace('_', ' ')}: {seconds * 1000:.0f} ms"
+                               for phase, seconds in metrics.startup.items())
+        summary_var.set(f"{metrics.scans_per_minute()} scans/min  •  {granted} granted, {denied} denied ({ratio})"
+                        + (f"\nStartup: {startup}" if startup else ""))
+        
+        for stage, label in STAGES:
+            histogram = metrics.stages[stage]
+            if histogram.count:
+                p95 = histogram.quantile(0.95)
+                p95_text = f"≤ {p95 * 1000:g}" if p95 != float("inf") else "> 1000"
+                tree.item(stage, values=(label, histogram.count,
+                                         f"{histogram.sum / histogram.count * 1000:.2f}", p95_text))
+        
+        refresh_job = parent.after(STATS_REFRESH_TIME, refresh_stats)
+    
+    def stop_refresh(event):
+        """Cancel the refresh timer when the admin panel closes"""
+        if refresh_job is not None:
+            parent.after_cancel(refresh_job)
+    
+    stats_frame.bind("<Destroy>", stop_refresh)
+    refresh_stats()
+
+def setup_analytics_tab(parent):
+    """Set up the analytics tab, drawn from the event store's rollups rather than the raw log"""
+    analytics_frame = Frame(parent, bg=colors["white"], padx=20, pady=10)
+    analytics_frame.pack(fill=BOTH, expand=True)
+    
+    # Title and door filter
+    header_frame = Frame(analytics_frame, bg=colors["white"])
+    header_frame.pack(fill=X, pady=5)
+    
+    title_lbl = Label(header_frame, text="Today by Hour", 
+                    font=("Helvetica", 14, "bold"), 
+                    fg=colors["primary"], bg=colors["white"])
+    title_lbl.pack(side=LEFT)
+    
+    door_var = StringVar(value="All doors")
+    door_box = ttk.Combobox(header_frame, textvariable=door_var, state="readonly", width=15,
+                            values=["All doors"] + [reader["door"] for reader in READERS])
+    door_box.pack(side=RIGHT)
+    
+    summary_var = StringVar()
+    summary_lbl = Label(analytics_frame, textvariable=summary_var, 
+                      font=("Helvetica", 11), 
+                      fg=colors["text"], bg=colors["white"])
+    summary_lbl.pack(anchor="w")
+    
+    # Stacked bars per hour, granted under denied
+    chart = Canvas(analytics_frame, height=180, bg=colors["white"], highlightthickness=0)
+    chart.pack(fill=X, pady=5)
+    
+    # Card tables
+    tables_frame = Frame(analytics_frame, bg=colors["white"])
+    tables_frame.pack(fill=BOTH, expand=True, pady=5)
+    
+    def make_table(title, columns):
+        frame = Frame(tables_frame, bg=colors["white"])
+        frame.pack(side=LEFT, fill=BOTH, expand=True, padx=5)
+        Label(frame, text=title, font=("Helvetica", 12, "bold"), 
+              fg=colors["primary"], bg=colors["white"]).pack(anchor="w")
+        tree = ttk.Treeview(frame, columns=[key for key, _, _ in columns], show="headings", height=8)
+        for key, heading, width in columns:
+            tree.column(key, width=width, anchor="center")
+            tree.heading(key, text=heading)
+        tree.pack(fill=BOTH, expand=True)
+        return tree
+    
+    week_tree = make_table("Top Denied Cards This Week", 
+                           (("card_id", "Card ID", 120), ("name", "Name", 120), ("count", "Denied", 70)))
+    all_time_tree = make_table("Most Denied Cards Ever", 
+                               (("card_id", "Card ID", 120), ("count", "Denied", 70), ("last_seen", "Last Seen", 150)))
+    
+    refresh_job = None
+    chart_data = None  # (counts, day) last drawn, so a resize redraws without querying
+    
+    def draw_chart(counts, today):
+        nonlocal chart_data
+        chart_data = (counts, today)
+        chart.delete("all")
+        width = max(chart.winfo_width(), 480)
+        height = int(chart["height"])
+        slot = width / 24
+        totals = [(counts.get((f"{today} {hour:02d}", "ACCESS GRANTED"), 0),
+                   counts.get((f"{today} {hour:02d}", "ACCESS DENIED"), 0)) for hour in range(24)]
+        peak = max([granted + denied for granted, denied in totals] + [1])
+        scale = (height - 30) / peak
+        for hour, (granted, denied) in enumerate(totals):
+            x0, x1 = hour * slot + 2, (hour + 1) * slot - 2
+            base = height - 15
+            if granted:
+                chart.create_rectangle(x0, base - granted * scale, x1, base, fill=colors["success"], width=0)
+            if denied:
+                top = base - granted * scale
+                chart.create_rectangle(x0, top - denied * scale, x1, top, fill=colors["error"], width=0)
+            if hour % 3 == 0:
+                chart.create_text(x0, height - 2, text=f"{hour:02d}", anchor="sw",
+                                  font=("Helvetica", 8), fill=colors["secondary"])
+        chart.create_text(2, 2, text=f"max {peak}/h", anchor="nw", font=("Helvetica", 8), fill=colors["secondary"])
+    
+    def refresh_analytics():
+        nonlocal refresh_job
+        today = datetime.date.today()
+        day = today.isoformat()
+        week_start = (today - datetime.timedelta(days=today.weekday())).isoformat()
+        door = None if door_var.get() == "All doors" else door_var.get()
+        
+        try:
+            counts = event_store.hourly_counts(f"{day} 00", f"{day} 23", door)
+            granted = sum(count for (_, status), count in counts.items() if status == "ACCESS GRANTED")
+            denied = sum(count for (_, status), count in counts.items() if status == "ACCESS DENIED")
+            summary_var.set(f"Today: {granted + denied} scans, {granted} granted, {denied} denied")
+            draw_chart(counts, day)
+            
+            week_tree.delete(*week_tree.get_children())
+            for card_id, count in event_store.top_cards(week_start, day, "ACCESS DENIED"):
+                user = USERS.get(card_id)
+                week_tree.insert("", "end", values=(card_id, user["name"] if user else "Unknown", count))
+            
+            all_time_tree.delete(*all_time_tree.get_children())
+            for card_id, count, last_seen in event_store.denied_cards():
+                all_time_tree.insert("", "end", values=(card_id, count, last_seen))
+        except Exception as e:
+            print(f"Error refreshing analytics: {e}")
+        
+        # Refresh every few seconds, even after an error
+        refresh_job = parent.after(LOGS_REFRESH_TIME, refresh_analytics)
+    
+    def refresh_now(event=None):
+        if refresh_job is not None:
+            parent.after_cancel(refresh_job)
+        refresh_analytics()
+    
+    def stop_refresh(event):
+        """Cancel the refresh timer when the admin panel closes"""
+        if refresh_job is not None:
+            parent.after_cancel(refresh_job)
+    
+    def redraw_chart(event):
+        if chart_data is not None:
+            draw_chart(*chart_data)
+    
+    door_box.bind("<<ComboboxSelected>>", refresh_now)
+    chart.bind("<Configure>", redraw_chart)
+    analytics_frame.bind("<Destroy>", stop_refresh)
+    refresh_analytics()
+
 # --- SERIAL CONNECTION AND APPLICATION STARTUP ---
 
-# Initialize serial connection
-try:
-    ser = serial.Serial(PORT, BAUD, timeout=1)
-    print(f"Connected to {PORT} at {BAUD} baud")
-except Exception as e:
-    print(f"Serial connection error: {e}")
-    messagebox.showerror("Connection Error", f"Failed to connect to RFID reader at {PORT}.\n\nError: {e}")
-    # Continue without serial connection for UI testing
-    ser = None
-
-# Start the RFID reading thread if connection was successful
-if ser is not None:
-    thread = threading.Thread(target=read_loop, daemon=True)
-    thread.start()
-
-# Add admin user if not exists
-if not os.path.exists(USERS_FILE):
-    save_users(USERS)
-
-current_state = "main_menu"
-show_main_options()
-
-# Start the mainloop
-root.mainloop()
\ No newline at end of file
+# Everything with side effects happens in main(): the engine process (spawned on Windows)
+# re-imports this file, and must not build a window, open the stores or touch the port
+def main():
+    """Load the users, start the engine, then open the log, build the window and run the kiosk"""
+    global engine, attached, scan_log, current_state
+    # Users and the engine first, so the doors answer before the log store or the window is ready
+    open_users()
+
+    # Start the access engine: serial I/O and the allow/deny decision run in their own
+    # process so GUI stalls never delay the reply to the door controller.
+    # If the port can't be opened the UI keeps running for testing.
+    # When access_daemon.py is already serving the doors, attach to its event stream instead
+    # (Unix sockets only, so on Windows the GUI always runs the engine itself).
+    try:
+        engine = DaemonClient(DAEMON_SOCKET)
+        attached = True
+        print(f"Attached to the access daemon at {DAEMON_SOCKET}")
+        metrics.mark_startup("first_serviceable_scan", time.perf_counter() - LAUNCH_TIME)
+    except OSError:
+        engine = AccessEngine(READERS, READ_MODE)
+        engine.publish_users(USERS)
+        engine.start()
+
+    # Pick up changes other tools make to the user store
+    user_table.start_watcher()
+
+    # Engine events wait in its queue until the first poll, after the log and the window are up
+    open_log()
+    if not attached:
+        # Log access attempts, each scan once its cooldown window closes
+        scan_log = ScanLog(log_writer)
+    build_window()
+    root.after(EVENT_POLL_TIME, poll_engine_events)
+
+    # Write the metrics file for the node exporter (the daemon writes it when attached)
+    if not attached:
+        root.after(METRICS_INTERVAL, write_metrics)
+
+    current_state = "main_menu"
+    show_main_options()
+
+    # Once the first screen is up, note the time and prepare the denied-access graphics
+    def startup_done():
+        metrics.mark_startup("gui_ready", time.perf_counter() - LAUNCH_TIME)
+        prepare_denied_image()
+    root.after_idle(startup_done)
+
+    # Start the mainloop
+    root.mainloop()
+    engine.stop()  # Closes the open cooldown windows
+    if not attached:  # The daemon logs its own events
+        for event in engine.poll_events():
+            if event[0] == "card_done":
+                scan_log.closed(*event[1:])
+            elif event[0] == "suppressed":
+                scan_log.suppressed(*event[1:])
+        scan_log.close_all()
+    log_writer.close()  # Durably write any queued log rows
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import json, os, sqlite3, string, threading, time
+from types import MappingProxyType
+
+# — Configuration —
+WATCH_INTERVAL = 1.0  # in seconds, how often the watcher checks the store for outside changes
+
+# — Card IDs —
+UID_LENGTHS = (8, 14, 20)  # hex digits in 4, 7 and 10 byte MIFARE UIDs
+
+def normalize_uid(raw):
+    """Card ID the way the reader reports it: trimmed, upper-case hex"""
+    return raw.strip().upper()
+
+def is_valid_uid(uid):
+    return len(uid) in UID_LENGTHS and all(c in string.hexdigits for c in uid)
+
+# Custom class for the enrolled user table
+class UserStore:
+    """Enrolled users in SQLite (WAL mode), one row per card
+
+    Every change is a single-row transaction, so registering or deleting a
+    user costs O(log n) and a crash can never leave a half-written allowlist.
+    """
+    def __init__(self, path, json_path=None):
+        self.path = path
+        self.local = threading.local()
+
+        conn = self.connection()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS users (
+                card_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                image TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+
+        # Import the old users.json the first time the store is opened
+        if json_path is not None:
+            imported = self.migrate_json(json_path)
+            if imported:
+                print(f"Imported {imported} users from {json_path} into {path}")
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def migrate_json(self, json_path):
+        """One-shot import of a users.json file, returns the number of users imported"""
+        conn = self.connection()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone():
+            return 0
+        users = {}
+        if os.path.exists(json_path):
+            try:
+                with open(json_path, "r") as f:
+                    users = json.load(f)
+            except Exception as e:
+                print(f"Error loading users file: {e}")
+                return 0
+        with conn:
+            self._put_rows(conn, users)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('json_imported', ?)", (json_path,))
+        return len(users)
+
+    def load(self):
+        """All users as {card_id: {"name": ..., "image": ...}}"""
+        rows = self.connection().execute("SELECT card_id, name, image FROM users")
+        return {card_id: {"name": name, "image": image} for card_id, name, image in rows}
+
+    def get(self, card_id):
+        row = self.connection().execute(
+            "SELECT name, image FROM users WHERE card_id = ?", (card_id,)
+        ).fetchone()
+        return {"name": row[0], "image": row[1]} if row else None
+
+    def put(self, card_id, user):
+        """Add or replace one user"""
+        self.put_many({card_id: user})
+
+    def put_many(self, users):
+        """Add or replace several users in one transaction"""
+        conn = self.connection()
+        with conn:
+            self._put_rows(conn, users)
+
+    def delete(self, card_id):
+        conn = self.connection()
+        with conn:
+            conn.execute("DELETE FROM users WHERE card_id = ?", (card_id,))
+
+    def close(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    def _put_rows(self, conn, users):
+        conn.executemany(
+            "INSERT OR REPLACE INTO users (card_id, name, image) VALUES (?, ?, ?)",
+            [(card_id, user["name"], user["image"]) for card_id, user in users.items()]
+        )
+
+def freeze_users(users):
+    """Read-only view of a {card_id: user} dict, users included"""
+    return MappingProxyType({card_id: MappingProxyType(dict(user)) for card_id, user in users.items()})
+
+# Custom class for the live user table
+class UserTable:
+    """Immutable snapshot of the user table, replaced as a whole on every change
+
+    Readers just take table.snapshot and never need a lock; writers build a
+    new snapshot and swap it in. A watcher thread reloads the snapshot when
+    another process (bulk_enroll, a second kiosk) changes the store.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.snapshot = freeze_users({})
+        self.listeners = []
+        self.lock = threading.Lock()  # Serializes writers, readers never take it
+        self.last_reload = (0, 0.0)  # (entry count, seconds)
+        self.watcher = None
+        self.version_conn = None  # Watcher's connection, shared under self.lock
+        self.version = None  # data_version the snapshot reflects
+
+    def on_change(self, callback):
+        """Call callback(snapshot) after every swap, from whichever thread made the change"""
+        self.listeners.append(callback)
+
+    def reload(self):
+        """Load the whole store into a new snapshot"""
+        start = time.perf_counter()
+        with self.lock:
+            users = self.store.load()
+            self._swap(freeze_users(users))
+        self.last_reload = (len(users), time.perf_counter() - start)
+        print(f"Loaded {len(users)} users in {self.last_reload[1] * 1000:.1f} ms")
+        return self.snapshot
+
+    def put(self, card_id, user):
+        """Add or replace one user in the store and the snapshot"""
+        with self.lock:
+            before = self._data_version()
+            self.store.put(card_id, user)
+            self._own_write(before)
+            users = dict(self.snapshot)
+            users[card_id] = MappingProxyType(dict(user))
+            self._swap(MappingProxyType(users))
+
+    def delete(self, card_id):
+        with self.lock:
+            before = self._data_version()
+            self.store.delete(card_id)
+            self._own_write(before)
+            users = dict(self.snapshot)
+            users.pop(card_id, None)
+            self._swap(MappingProxyType(users))
+
+    def start_watcher(self, interval=WATCH_INTERVAL):
+        """Reload the snapshot whenever the store is changed by another connection"""
+        if self.watcher is None:
+            with self.lock:
+                self.version_conn = sqlite3.connect(self.store.path, timeout=10, check_same_thread=False)
+                self.version = self._data_version()
+            self.watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+            self.watcher.start()
+
+    def _data_version(self):
+        """data_version seen by the watcher's connection, None before the watcher starts"""
+        if self.version_conn is None:
+            return None
+        return self.version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _own_write(self, before):
+        """Take in the data_version change of a write this table made itself, so it doesn't reload
+
+        If something else had committed since the last check, the version is
+        left alone and the watcher still reloads.
+        """
+        if self.version_conn is not None and before == self.version:
+            self.version = self._data_version()
+
+    def _watch(self, interval):
+        # data_version changes whenever any other connection commits, this process's own included
+        while True:
+            time.sleep(interval)
+            try:
+                with self.lock:
+                    current = self._data_version()
+                    changed = current != self.version
+                    self.version = current
+                if changed:
+                    self.reload()
+            except Exception as e:
+                print(f"Error reloading users: {e}")
+
+    def _swap(self, snapshot):
+        self.snapshot = snapshot
+        for callback in self.listeners:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"Error in user table listener: {e}")